@@ -0,0 +1,232 @@
+"""Scaling benchmarks of the search, routing, data generation and rendering.
+
+Run it from the repository root, i.e:
+
+    python -m benchmarks.run_benchmarks --output results.json
+    python -m benchmarks.run_benchmarks --output new.json --compare results.json
+
+"""
+import argparse
+import datetime
+import json
+import platform
+import time
+import tracemalloc
+
+import numpy as np
+from landing_zone_detection.graph_utils import SearchStats, find_landing_zone
+from landing_zone_detection.visualization_utils import adj_matrix_to_image
+from mock_data import data
+from preflight_planning.graph_utils import Params, find_routes
+
+GRID_SIZES = [7, 32, 128, 512, 2048]
+PEOPLE_QUANTITIES = [1, 10, 100, 1000]
+
+
+def measure(function, *args, repeats=5, **kwargs):
+    """Run a function measuring its wall time and peak memory.
+
+    The wall time is measured over repeats plain runs, since a single run is
+    too noisy to compare. tracemalloc slows down allocation-heavy code a
+    lot, so the peak memory comes from one more, traced run. The function
+    must do the same work every time.
+
+    Parameters
+    ----------
+    function : callable
+        Function to run.
+    *args : list
+        Arguments of the function.
+    repeats : int
+        Number of timed runs.
+    **kwargs : dict
+        Keyword arguments of the function.
+
+    Returns
+    -------
+    (object, dict, int)
+        The function's result, the wall time statistics in seconds (wall_time_s, the fastest run, wall_time_median_s and wall_time_max_s) and the peak memory allocated in bytes.
+
+    """
+    wall_times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        wall_times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        function(*args, **kwargs)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    wall_time = {
+        'wall_time_s': min(wall_times),
+        'wall_time_median_s': float(np.median(wall_times)),
+        'wall_time_max_s': max(wall_times),
+    }
+    return result, wall_time, peak_memory
+
+
+def make_generator(grid_size):
+    """RandomAerialImageDataGenerator of grid_size x grid_size items.
+
+    Items get smaller as the grid grows, so the frame stays a few thousand
+    pixels wide.
+
+    """
+    item_size = max(1, min(32, 4096 // grid_size))
+    return data.RandomAerialImageDataGenerator(
+        width=grid_size * item_size, height=grid_size * item_size,
+        col_size=item_size, row_size=item_size,
+    )
+
+
+def run_scenario(grid_size, people_quantity, seed, num_queries, repeats):
+    """Benchmark every stage on one seeded scenario.
+
+    Returns
+    -------
+    list
+        One result dict per benchmark.
+
+    """
+    generator = make_generator(grid_size)
+
+    def generate():
+        np.random.seed(seed)
+        return generator.generate(people_quantity=people_quantity)
+
+    scenario, wall_time, peak_memory = measure(generate, repeats=repeats)
+    results = [dict(wall_time, benchmark='generate',
+                    peak_memory_bytes=peak_memory)]
+
+    queries = scenario.person_coord_list[:num_queries]
+
+    def search():
+        stats = SearchStats()
+        for person_coord in queries:
+            find_landing_zone(person_coord, scenario.adj_matrix,
+                              scenario.height_map, stats=stats)
+        return stats
+
+    stats, wall_time, peak_memory = measure(search, repeats=repeats)
+    results.append(dict(wall_time, benchmark='find_landing_zone',
+                        queries=len(queries),
+                        peak_memory_bytes=peak_memory,
+                        nodes_expanded=stats.nodes_expanded))
+
+    params = Params(speed=10, landing_time=5, takeoff_time=5,
+                    maximum_flight_time=10**6, num_people=people_quantity,
+                    num_packets=3)
+    _, wall_time, peak_memory = measure(
+        find_routes, scenario.person_coord_list, scenario.adj_matrix.shape,
+        scenario.helipad_coord, params, repeats=repeats
+    )
+    results.append(dict(wall_time, benchmark='find_routes',
+                        peak_memory_bytes=peak_memory))
+
+    _, wall_time, peak_memory = measure(
+        adj_matrix_to_image, scenario.adj_matrix,
+        col_size=generator.col_size, row_size=generator.row_size,
+        repeats=repeats,
+    )
+    results.append(dict(wall_time, benchmark='adj_matrix_to_image',
+                        peak_memory_bytes=peak_memory))
+
+    for result in results:
+        result.update(grid_size=grid_size, people=people_quantity)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print the wall time ratio of each benchmark against a baseline run.
+
+    The ratio is the one of the fastest runs, which is the least affected
+    by the noise of the machine. A benchmark is flagged as a regression only
+    if the ratio is above the threshold and its fastest run is slower than
+    the slowest run of the baseline, so the spread of both runs doesn't
+    overlap.
+
+    Parameters
+    ----------
+    results : list
+        Results of this run.
+    baseline : list
+        Results of the baseline run.
+    threshold : float
+        Ratios above it are flagged as regressions.
+
+    """
+    def key(result):
+        return result['benchmark'], result['grid_size'], result['people']
+    baseline_by_key = {key(result): result for result in baseline}
+    for result in results:
+        if key(result) not in baseline_by_key:
+            continue
+        base = baseline_by_key[key(result)]
+        ratio = result['wall_time_s'] / max(base['wall_time_s'], 1e-9)
+        # Runs from before the repeats only have wall_time_s.
+        regression = ratio > threshold and result['wall_time_s'] \
+            > base.get('wall_time_max_s', base['wall_time_s'])
+        print('{:<20} {:>5}x{:<5} {:>5} people  {:6.2f}x  '
+              'spread {:5.1f}% vs {:5.1f}%{}'.format(
+                  key(result)[0], key(result)[1], key(result)[1],
+                  key(result)[2], ratio, spread(result), spread(base),
+                  '  REGRESSION' if regression else ''
+              ))
+
+
+def spread(result):
+    """Difference between the slowest and the fastest run, in percent of the fastest."""
+    return 100 * (result.get('wall_time_max_s', result['wall_time_s'])
+                  - result['wall_time_s']) / max(result['wall_time_s'], 1e-9)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--grid-sizes', type=int, nargs='+',
+                        default=GRID_SIZES)
+    parser.add_argument('--people', type=int, nargs='+',
+                        default=PEOPLE_QUANTITIES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--queries', type=int, default=10,
+                        help='find_landing_zone queries per scenario')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help='JSON of a previous run')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='wall time ratio flagged as a regression')
+    parser.add_argument('--repeats', type=int, default=5,
+                        help='timed runs of each benchmark')
+    args = parser.parse_args()
+
+    results = []
+    for grid_size in args.grid_sizes:
+        for people_quantity in args.people:
+            # The generator only places people on up to half of the map.
+            if people_quantity > grid_size * grid_size / 2:
+                continue
+            print('grid {0}x{0}, {1} people'.format(grid_size,
+                                                    people_quantity))
+            results.extend(run_scenario(grid_size, people_quantity,
+                                        args.seed, args.queries,
+                                        args.repeats))
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'metadata': {
+                'date': datetime.datetime.now().isoformat(),
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'platform': platform.platform(),
+                'seed': args.seed,
+                'repeats': args.repeats,
+            },
+            'results': results,
+        }, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f)['results'], args.threshold)
+
+
+if __name__ == '__main__':
+    main()
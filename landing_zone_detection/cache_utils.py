@@ -0,0 +1,172 @@
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+from landing_zone_detection.graph_utils import LandingZoneField
+
+
+def map_digest(adj_matrix, height_map):
+    """Content digest of an adj_matrix and height_map pair.
+
+    Parameters
+    ----------
+    adj_matrix : numpy.ndarray
+        Adjacent matrix where the meaning of each value is specified in the label_utils.py module.
+    height_map : numpy.ndarray
+        Depth estimation of the frame. Same shape as the adj_matrix.
+
+    Returns
+    -------
+    str
+        Hex digest of the shape, dtype and bytes of both arrays.
+
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for array in (adj_matrix, height_map):
+        array = np.ascontiguousarray(array)
+        digest.update(repr((array.shape, array.dtype.str)).encode())
+        digest.update(memoryview(array).cast('B'))
+    return digest.hexdigest()
+
+
+class LandingZoneCache(object):
+    """Least recently used cache of structures built from a map, i.e LandingZoneField.
+
+    Entries are keyed by the map_digest of the adj_matrix and height_map
+    they were built from, so equal maps share an entry even if they are
+    different arrays. Cached entries are shared, don't modify them.
+
+    Parameters
+    ----------
+    max_entries : int
+        Maximum number of entries kept in the cache.
+    max_bytes : int
+        Maximum memory used by the entries, according to their nbytes attribute.
+
+    Attributes
+    ----------
+    hits : int
+        Number of lookups answered by the cache.
+    misses : int
+        Number of lookups that had to build the entry.
+    evictions : int
+        Number of entries dropped to respect max_entries and max_bytes.
+    nbytes : int
+        Memory used by the entries currently in the cache.
+
+    """
+
+    def __init__(self, max_entries=16, max_bytes=1024**3):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, adj_matrix, height_map, builder=LandingZoneField,
+            digest=None):
+        """Return the cached entry for the map, building it on a miss.
+
+        Parameters
+        ----------
+        adj_matrix : numpy.ndarray
+            Adjacent matrix where the meaning of each value is specified in the label_utils.py module.
+        height_map : numpy.ndarray
+            Depth estimation of the frame. Same shape as the adj_matrix.
+        builder : callable
+            Called as builder(adj_matrix=adj_matrix, height_map=height_map) on a miss. The result should have a nbytes attribute.
+        digest : str
+            map_digest of the map. Pass it to skip hashing the arrays on every lookup.
+
+        Returns
+        -------
+        object
+            The object returned by builder for this map.
+
+        """
+        if digest is None:
+            digest = map_digest(adj_matrix, height_map)
+        key = (digest, builder)
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+        self.misses += 1
+        entry = builder(adj_matrix=adj_matrix, height_map=height_map)
+        entry_nbytes = int(getattr(entry, 'nbytes', 0))
+        # Entries that alone exceed the budget are returned but not kept.
+        if entry_nbytes <= self.max_bytes and self.max_entries > 0:
+            self._entries[key] = (entry, entry_nbytes)
+            self.nbytes += entry_nbytes
+            self._evict()
+        return entry
+
+    def _evict(self):
+        """Drop the least recently used entries until the limits are respected."""
+        while (len(self._entries) > self.max_entries
+               or self.nbytes > self.max_bytes):
+            _, (_, entry_nbytes) = self._entries.popitem(last=False)
+            self.nbytes -= entry_nbytes
+            self.evictions += 1
+
+    def clear(self):
+        """Drop every entry. The counters are kept."""
+        self._entries.clear()
+        self.nbytes = 0
+
+    def info(self):
+        """Counters useful to size the cache.
+
+        Returns
+        -------
+        dict
+            hits, misses, evictions, entries and nbytes.
+
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'nbytes': self.nbytes,
+        }
+
+
+DEFAULT_CACHE = LandingZoneCache()
+
+
+def find_landing_zone_cached(person_coord, adj_matrix, height_map,
+                             cache=DEFAULT_CACHE, digest=None):
+    """Same as find_landing_zone, but answered by a cached LandingZoneField of the map.
+
+    Parameters
+    ----------
+    person_coord : list
+        (x, y) coordinate in the adj_matrix of the person supposed to receive supplies or deliveries.
+    adj_matrix : numpy.ndarray
+        Adjacent matrix where the meaning of each value is specified in the label_utils.py module.
+    height_map : numpy.ndarray
+        Depth estimation of the frame. Same shape as the adj_matrix.
+    cache : LandingZoneCache
+        Cache where the field is looked up.
+    digest : str
+        map_digest of the map. Pass it to skip hashing the arrays on every query.
+
+    Returns
+    -------
+    (list, int)
+        Returns the shortest_path and the shortest_distance as a tuple.
+
+    """
+    field = cache.get(
+        adj_matrix=adj_matrix,
+        height_map=height_map,
+        builder=LandingZoneField,
+        digest=digest,
+    )
+    return field.query(person_coord)
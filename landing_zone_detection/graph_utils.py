@@ -1,3 +1,8 @@
+import heapq
+import time
+from contextlib import contextmanager, nullcontext
+
+import cv2
 import numpy as np
 from landing_zone_detection.label_utils import can_a_person_reach, can_uav_land
 
@@ -48,76 +53,342 @@ def distance_between_3d_points(x1, y1, z1, x2, y2, z2):
     return ((x2 - x1)**2 + (y2 - y1)**2 + (z2 - z1)**2)**(1/2)
 
 
-def hashable_coord(coord, mtx_shape):
-    """Transforms a coord list into a hashable type.
+class SearchState(object):
+    """Distance and predecessor grids of a search over an adj_matrix.
+
+    Cells are addressed by their flat index i.e i * num_cols + j. Paths are
+    not stored, they are rebuilt from the predecessors when needed.
 
     Parameters
     ----------
-    coord : list or ndarray
-        2D coordinate i.e (0,0).
-    mtx_shape : list or ndarray
-        Shape of the image i.e [1920, 1080, 3] or [1920, 1080].
+    shape : tuple
+        Shape of the adj_matrix i.e (7, 7).
+
+    Attributes
+    ----------
+    distances : numpy.ndarray
+        float32 grid with the distance from the source to each cell. Cells not reached yet are inf.
+    predecessors : numpy.ndarray
+        int32 grid with the flat index of the previous cell in the path to each cell. Sources and cells not reached yet are -1.
+
+    """
+
+    def __init__(self, shape):
+        self.shape = (int(shape[0]), int(shape[1]))
+        self.distances = np.full(self.shape, np.inf, dtype=np.float32)
+        self.predecessors = np.full(self.shape, -1, dtype=np.int32)
+
+    @property
+    def nbytes(self):
+        """Memory used by the grids, in bytes."""
+        return self.distances.nbytes + self.predecessors.nbytes
+
+    def flat_index(self, coord):
+        """Flat index of a 2D coordinate.
+
+        Parameters
+        ----------
+        coord : list
+            2D coordinate i.e (0,0).
+
+        Returns
+        -------
+        int
+            Index of the coordinate in the flattened grids.
+
+        """
+        return int(coord[0]) * self.shape[1] + int(coord[1])
+
+    def path_to(self, coord):
+        """Rebuild the path from the source to coord following the predecessors.
+
+        Parameters
+        ----------
+        coord : list
+            2D coordinate i.e (0,0).
+
+        Returns
+        -------
+        list
+            List of coordinates i.e [[0,0], [0,1], [1,2]]. Empty if coord wasn't reached.
+
+        """
+        idx = self.flat_index(coord)
+        predecessors = self.predecessors.reshape(-1)
+        if np.isinf(self.distances.reshape(-1)[idx]):
+            return []
+        path = []
+        while idx != -1:
+            path.append(list(divmod(idx, self.shape[1])))
+            idx = int(predecessors[idx])
+        path.reverse()
+        return path
+
+
+BASE_NEIGHBOURS = [[1, 0], [0, 1], [1, 1],
+                   [-1, 0], [0, -1], [-1, -1],
+                   [-1, 1], [1, -1]]
+
+
+class SearchStats(object):
+    """Counters and timings filled by a search when it's given as its stats argument.
+
+    Searches only measure anything when they get a SearchStats, so leaving
+    it out costs nothing.
+
+    Attributes
+    ----------
+    nodes_expanded : int
+        Number of cells taken out of the priority queue and expanded.
+    edge_relaxations : int
+        Number of edges to existing and reachable neighbours that were evaluated.
+    reexpansions : int
+        Number of expansions of cells that had already been expanded.
+    max_frontier : int
+        Largest size of the priority queue.
+    timings : dict
+        Seconds spent in each phase of the search, i.e 'edge_costs' or 'search'.
+
+    """
+
+    def __init__(self):
+        self.nodes_expanded = 0
+        self.edge_relaxations = 0
+        self.reexpansions = 0
+        self.max_frontier = 0
+        self.timings = {}
+
+    @contextmanager
+    def phase(self, name):
+        """Context manager that adds the time spent inside it to timings[name].
+
+        Parameters
+        ----------
+        name : str
+            Name of the phase.
+
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + \
+                time.perf_counter() - start
+
+
+def timed_phase(stats, name):
+    """stats.phase(name), or a context manager that does nothing if there are no stats."""
+    return nullcontext() if stats is None else stats.phase(name)
+
+
+def compute_edge_costs(adj_matrix, height_map):
+    """Cost of the step from each cell to each of its 8 neighbours, in one vectorized pass.
+
+    The cost of a step is the distance_between_3d_points of both cell
+    centres, using the absolute height of each cell. Steps to coords that do
+    not exist or that a person cannot reach cost inf, so search engines
+    don't need to check bounds or labels.
+
+    Parameters
+    ----------
+    adj_matrix : numpy.ndarray
+        Adjacent matrix where the meaning of each value is specified in the label_utils.py module.
+    height_map : numpy.ndarray
+        Depth estimation of the frame. Same shape as the adj_matrix.
 
     Returns
     -------
-    int
-        A representation of the coord that is hashable.
+    numpy.ndarray
+        float32 array of shape (num_rows, num_cols, 8). The last axis follows the order of BASE_NEIGHBOURS.
 
     """
-    return coord[0] * mtx_shape[0] + coord[1]
+    num_rows, num_cols = adj_matrix.shape[:2]
+    heights = np.abs(np.asarray(height_map, dtype=np.float64))
+    walkable = can_a_person_reach(np.asarray(adj_matrix))
+    edge_costs = np.full((num_rows, num_cols, len(BASE_NEIGHBOURS)), np.inf,
+                         dtype=np.float32)
+    for k, (di, dj) in enumerate(BASE_NEIGHBOURS):
+        # Cells whose neighbour in this direction exists, and the neighbours.
+        src = (slice(max(0, -di), num_rows - max(0, di)),
+               slice(max(0, -dj), num_cols - max(0, dj)))
+        dst = (slice(max(0, di), num_rows - max(0, -di)),
+               slice(max(0, dj), num_cols - max(0, -dj)))
+        steps = distance_between_3d_points(
+            0, 0, heights[src], di, dj, heights[dst]
+        )
+        edge_costs[src + (k,)] = np.where(walkable[dst], steps, np.inf)
+    return edge_costs
 
 
-class Node(object):
-    """Short summary.
+def window_edge_costs(edge_costs, rows, cols, region=None):
+    """edge_costs of a window of the map, without the steps that leave it.
 
     Parameters
     ----------
-    coord : list or ndarray
-        2D coordinate i.e (0,0).
-    mtx_shape : list or ndarray
-        Shape of the adj_matrix i.e [7, 7].
-    label : type
-        Description of parameter `label`.
-    height : type
-        Description of parameter `height`.
-    distance : type
-        Description of parameter `distance`.
-    path : type
-        Description of parameter `path`.
+    edge_costs : numpy.ndarray
+        Output of compute_edge_costs for the whole map.
+    rows : slice
+        Rows of the window.
+    cols : slice
+        Columns of the window.
+    region : numpy.ndarray
+        Optional boolean grid with the shape of the window. Steps to cells outside it cost inf too.
+
+    Returns
+    -------
+    numpy.ndarray
+        Copy of edge_costs[rows, cols] that search engines can run on as if the window was the whole map.
 
-    Attributes
-    ----------
-    hash : type
-        Description of attribute `hash`.
-    __hash__ : type
-        Description of attribute `__hash__`.
     """
+    window = edge_costs[rows, cols].copy()
+    num_rows, num_cols = window.shape[:2]
+    for k, (di, dj) in enumerate(BASE_NEIGHBOURS):
+        inside = np.zeros((num_rows, num_cols), dtype=bool)
+        src = (slice(max(0, -di), num_rows - max(0, di)),
+               slice(max(0, -dj), num_cols - max(0, dj)))
+        if region is None:
+            inside[src] = True
+        else:
+            dst = (slice(max(0, di), num_rows - max(0, -di)),
+                   slice(max(0, dj), num_cols - max(0, -dj)))
+            inside[src] = region[dst]
+        window[..., k][~inside] = np.inf
+    return window
 
-    def __init__(self, coord, mtx_shape,
-                 label=None, height=None, distance=-1, path=[]):
-        self.coord = coord
-        self.mtx_shape = mtx_shape
-        self.label = label
-        self.height = height
-        self.distance = distance
-        self.path = path
-        self.hash = self.__hash__(coord=self.coord, mtx_shape=self.mtx_shape)
+def landing_zone_heuristic(adj_matrix):
+    """Planar distance from each cell to its closest landing zone.
 
-    def __hash__(self, coord, mtx_shape):
-        """Hash the node.
+    A step between cell centres is never shorter than its planar
+    projection, so this is an admissible and consistent A* heuristic for
+    find_landing_zone. It's computed with an exact euclidean distance
+    transform, in a single pass over the grid.
 
-        Returns
-        -------
-        int
-            A representation of the coord that is hashable.
+    Parameters
+    ----------
+    adj_matrix : numpy.ndarray
+        Adjacent matrix where the meaning of each value is specified in the label_utils.py module.
 
-        """
-        return hashable_coord(coord=coord, mtx_shape=mtx_shape)
+    Returns
+    -------
+    numpy.ndarray
+        float32 grid with the same shape as the adj_matrix.
 
+    """
+    not_landing_zone = np.logical_not(can_uav_land(adj_matrix))
+    if not_landing_zone.all():
+        # No goal at all, any constant is admissible.
+        return np.zeros(adj_matrix.shape, dtype=np.float32)
+    return cv2.distanceTransform(
+        not_landing_zone.astype(np.uint8),
+        cv2.DIST_L2,
+        cv2.DIST_MASK_PRECISE,
+    )
 
-def find_landing_zone(person_coord, adj_matrix, height_map):
+
+def grid_dijkstra(edge_costs, state, heap,
+              is_goal=None, landing_zones=None, heuristic=None, stats=None,
+              on_expand=None):
+    """Run Dijkstra (or A* if there's a heuristic) over the walkable cells, updating the state in place.
+
+    Parameters
+    ----------
+    edge_costs : numpy.ndarray
+        Output of compute_edge_costs.
+    state : SearchState
+        Search state whose distances are already set for the cells in heap.
+    heap : list
+        Priority queue of (priority, flat index) tuples to start from. The priority is the distance plus the heuristic.
+    is_goal : callable
+        Called with the flat index of each expanded cell. The search stops at the first cell for which it returns True.
+    landing_zones : numpy.ndarray
+        Optional flattened int32 grid. Each reached cell inherits the value of its predecessor.
+    heuristic : numpy.ndarray
+        Optional flattened grid with a consistent lower bound of the distance from each cell to a goal.
+    stats : SearchStats
+        Optional counters to fill.
+    on_expand : callable
+        Optional hook called as on_expand(flat_idx, distance) on each expansion, i.e to attach samplers or tracers.
+
+    Returns
+    -------
+    int
+        Flat index of the goal cell, or -1 if the search exhausted the walkable cells.
+
+    """
+    num_cols = state.shape[1]
+    neighbour_offsets = [di * num_cols + dj for di, dj in BASE_NEIGHBOURS]
+    edge_costs = edge_costs.reshape(-1, len(BASE_NEIGHBOURS))
+    distances = state.distances.reshape(-1)
+    predecessors = state.predecessors.reshape(-1)
+    inf = float('inf')
+    nodes_expanded = 0
+    goal_idx = -1
+    # Extra bookkeeping only happens when someone is looking.
+    instrumented = stats is not None or on_expand is not None
+    edge_relaxations = reexpansions = max_frontier = 0
+    expanded = set()
+
+    while heap:
+        if instrumented:
+            max_frontier = max(max_frontier, len(heap))
+        curr_priority, curr_idx = heapq.heappop(heap)
+        curr_distance = float(distances[curr_idx])
+        # Skip stale entries, the cell was already reached with less cost.
+        if heuristic is None:
+            if curr_priority > curr_distance:
+                continue
+        elif curr_priority > curr_distance + heuristic[curr_idx]:
+            continue
+        nodes_expanded += 1
+        curr_edge_costs = edge_costs[curr_idx].tolist()
+        if instrumented:
+            if curr_idx in expanded:
+                reexpansions += 1
+            expanded.add(curr_idx)
+            edge_relaxations += len(curr_edge_costs) - \
+                curr_edge_costs.count(inf)
+            if on_expand is not None:
+                on_expand(curr_idx, curr_distance)
+        if is_goal is not None and is_goal(curr_idx):
+            goal_idx = curr_idx
+            break
+        for offset, cost in zip(neighbour_offsets, curr_edge_costs):
+            # Ignore coords that do not exist or that are unreachable.
+            if cost == inf:
+                continue
+            nb_idx = curr_idx + offset
+            nb_distance = curr_distance + cost
+            if nb_distance < distances[nb_idx]:
+                distances[nb_idx] = nb_distance
+                predecessors[nb_idx] = curr_idx
+                if landing_zones is not None:
+                    landing_zones[nb_idx] = landing_zones[curr_idx]
+                # Push the stored float32 value so stale checks compare
+                # like with like.
+                nb_priority = float(distances[nb_idx])
+                if heuristic is not None:
+                    nb_priority += heuristic[nb_idx]
+                heapq.heappush(heap, (nb_priority, nb_idx))
+
+    if stats is not None:
+        stats.nodes_expanded += nodes_expanded
+        stats.edge_relaxations += edge_relaxations
+        stats.reexpansions += reexpansions
+        stats.max_frontier = max(stats.max_frontier, max_frontier)
+    return goal_idx
+
+
+def find_landing_zone(person_coord, adj_matrix, height_map,
+                      algorithm='dijkstra', heuristic=None, edge_costs=None,
+                      stats=None, on_expand=None, backend='python'):
     """Find the landing zone closest to the person xy coordinates considering the z terrain elevation..
 
+    It's a Dijkstra search with the person as its initial point. The search
+    stops as soon as the first landing zone leaves the priority queue, since
+    no other landing zone can be closer than it. With algorithm='astar' the
+    queue is ordered by the distance plus the planar distance to the closest
+    landing zone, which expands far fewer cells and finds the same distance.
+
     Parameters
     ----------
     person_coord : list
@@ -126,116 +397,312 @@ def find_landing_zone(person_coord, adj_matrix, height_map):
         Adjacent matrix where the meaning of each value is specified in the label_utils.py module.
     height_map : numpy.ndarray
         Depth estimation of the frame. Same shape as the adj_matrix.
+    algorithm : str
+        'dijkstra' or 'astar'.
+    heuristic : numpy.ndarray
+        landing_zone_heuristic of the adj_matrix, used by 'astar'. Computed if not given. Pass it to reuse it between queries on the same map.
+    edge_costs : numpy.ndarray
+        compute_edge_costs of the map. Computed if not given. Pass it to reuse it between queries on the same map.
+    stats : SearchStats
+        Optional counters and phase timings to fill, i.e the number of nodes expanded.
+    on_expand : callable
+        Optional hook called as on_expand(flat_idx, distance) each time a cell is expanded.
+    backend : str
+        'python' runs the reference search of this module. 'scipy' runs the compiled scipy.sparse.csgraph.dijkstra over a CSR version of the grid, bounded by a limit that grows until a landing zone is found. It only supports algorithm='dijkstra' and only fills the timings of stats.
 
     Returns
     -------
     (list, int)
         Returns the shortest_path and the shortest_distance as a tuple.
     """
-    # TODO: [performance] move code to C/C++ or to a recursive language
-    base_neighbours = np.asarray([[1, 0], [0, 1], [1, 1],
-                                  [-1, 0], [0, -1], [-1, -1],
-                                  [-1, 1], [1, -1]])
-    shortest_paths_dict = {}
-
-    person_node = Node(
-        coord=person_coord,
-        mtx_shape=adj_matrix.shape,
-        path=[person_coord],
-        distance=0,
-        height=height_map[person_coord[0]][person_coord[1]],
-        label=adj_matrix[person_coord[0]][person_coord[1]],
-    )
-    shortest_paths_dict[person_node.hash] = person_node
-    find_landing_zone_re(
-        curr_node=person_node,
-        adj_matrix=adj_matrix,
-        height_map=height_map,
-        shortest_paths_dict=shortest_paths_dict,
-        base_neighbours=base_neighbours
-    )
+    if backend == 'scipy':
+        if algorithm != 'dijkstra':
+            raise ValueError(
+                "The scipy backend only supports algorithm='dijkstra'"
+            )
+        from landing_zone_detection.sparse_utils import \
+            find_landing_zones_sparse
+        with timed_phase(stats, 'search'):
+            return find_landing_zones_sparse(
+                person_coord_list=[person_coord],
+                adj_matrix=adj_matrix,
+                height_map=height_map,
+                edge_costs=edge_costs,
+            )[0]
+    elif backend != 'python':
+        raise ValueError('Unknown backend: {}'.format(backend))
+    if algorithm == 'astar':
+        if heuristic is None:
+            with timed_phase(stats, 'heuristic'):
+                heuristic = landing_zone_heuristic(adj_matrix)
+        heuristic = np.asarray(heuristic, dtype=np.float64).reshape(-1)
+    elif algorithm == 'dijkstra':
+        heuristic = None
+    else:
+        raise ValueError('Unknown algorithm: {}'.format(algorithm))
+    if edge_costs is None:
+        with timed_phase(stats, 'edge_costs'):
+            edge_costs = compute_edge_costs(adj_matrix, height_map)
+    state = SearchState(adj_matrix.shape)
+    person_idx = state.flat_index(person_coord)
+    state.distances.reshape(-1)[person_idx] = 0
+    adj_matrix_flat = adj_matrix.reshape(-1)
+
+    def is_goal(idx):
+        # The person's own position is never a landing zone.
+        return idx != person_idx and can_uav_land(adj_matrix_flat[idx])
+
+    start_priority = 0.0 if heuristic is None else heuristic[person_idx]
+    with timed_phase(stats, 'search'):
+        landing_zone_idx = grid_dijkstra(
+            edge_costs=edge_costs,
+            state=state,
+            heap=[(start_priority, person_idx)],
+            is_goal=is_goal,
+            heuristic=heuristic,
+            stats=stats,
+            on_expand=on_expand,
+        )
+    if landing_zone_idx == -1:
+        return [], -1
+    landing_zone_coord = divmod(landing_zone_idx, state.shape[1])
+    with timed_phase(stats, 'path'):
+        shortest_path = state.path_to(landing_zone_coord)
+    return shortest_path, float(state.distances[landing_zone_coord])
 
-    del shortest_paths_dict[person_node.hash]
 
-    shortest_path = []
-    shortest_distance = -1
+class LandingZoneField(SearchState):
+    """Nearest landing zone of every walkable cell of an adj_matrix.
 
-    for node in shortest_paths_dict.values():
-        if not can_uav_land(node.label):
-            continue
-        if (shortest_distance > node.distance) or (shortest_distance == -1):
-            shortest_path = node.path
-            shortest_distance = node.distance
+    Walking costs are symmetric, so a single Dijkstra seeded from every
+    landing zone at once gives, for each cell, the distance to its closest
+    landing zone. The predecessor of a cell in that search is the next hop
+    of the path from the cell to the landing zone.
+
+    Parameters
+    ----------
+    adj_matrix : numpy.ndarray
+        Adjacent matrix where the meaning of each value is specified in the label_utils.py module.
+    height_map : numpy.ndarray
+        Depth estimation of the frame. Same shape as the adj_matrix.
+
+    Attributes
+    ----------
+    distances : numpy.ndarray
+        float32 grid with the distance from each cell to its closest landing zone. Unreachable cells are inf.
+    predecessors : numpy.ndarray
+        int32 grid with the flat index of the next hop towards the closest landing zone. Landing zones and unreachable cells are -1.
+    landing_zones : numpy.ndarray
+        int32 grid with the flat index of the closest landing zone of each cell. Unreachable cells are -1.
 
-    return shortest_path, shortest_distance
+    """
 
+    def __init__(self, adj_matrix, height_map):
+        super(LandingZoneField, self).__init__(adj_matrix.shape)
+        # Keep copies, so the field can be cached and reused even if the
+        # caller modifies its arrays afterwards.
+        self.adj_matrix = np.array(adj_matrix)
+        self.height_map = np.array(height_map)
+        self.edge_costs = compute_edge_costs(self.adj_matrix, self.height_map)
+        self.landing_zones = np.full(self.shape, -1, dtype=np.int32)
+
+        landing_zone_idxs = np.flatnonzero(can_uav_land(self.adj_matrix))
+        self.distances.reshape(-1)[landing_zone_idxs] = 0
+        self.landing_zones.reshape(-1)[landing_zone_idxs] = landing_zone_idxs
+        grid_dijkstra(
+            edge_costs=self.edge_costs,
+            state=self,
+            heap=[(0.0, int(idx)) for idx in landing_zone_idxs],
+            landing_zones=self.landing_zones.reshape(-1),
+        )
 
-def find_landing_zone_re(curr_node,
-                         adj_matrix, height_map,
-                         shortest_paths_dict,
-                         base_neighbours):
-    """Recursive part of find_landing_zone. It doesn't return anything, it just updates the shortest_paths_dict.
+    @property
+    def nbytes(self):
+        """Memory used by the field, in bytes."""
+        return (super(LandingZoneField, self).nbytes
+                + self.landing_zones.nbytes + self.edge_costs.nbytes
+                + self.adj_matrix.nbytes + self.height_map.nbytes)
 
-    Parameters
-    ----------
-    curr_node : Node
-        Current node.
+    def update(self, changed_cells):
+        """Repair the field after a few cells of the map changed, i.e a fallen tree or a flooded patch.
 
+        Only the cells whose path to the landing zone went through a changed
+        cell are invalidated. They are seeded again from their valid
+        neighbours and a Dijkstra from those seeds (and from the changed
+        cells) propagates both increases and decreases, so the rest of the
+        map is never touched. Don't update fields owned by a LandingZoneCache.
 
-    shortest_paths_dict : dict
-        Dict of the path to each node.
-    base_neighbours : list of lists
-        Neighbours of [0,0]: [1,0], [0,1], [1,1], [-1,0], [0,-1], [-1,-1], [-1,1], [1,-1]. Some of them may not exist in a 2D image.
+        Parameters
+        ----------
+        changed_cells : list
+            List of (i, j, new_label, new_height) tuples.
 
-    """
-    neighbour_list = base_neighbours + np.asarray(curr_node.coord)
-    for nb_node_coord in neighbour_list:
-        # Ignore coords that do not exist i.e (-1, 99999999).
-        if not do_coord_exist(nb_node_coord, curr_node.mtx_shape):
-            continue
-        # Ignore unreachable coords.
-        nb_node_label = adj_matrix[nb_node_coord[0]][nb_node_coord[1]]
-        if not can_a_person_reach(nb_node_label):
-            continue
-        # If neighbour's already in shortest_paths_dict, access it. Otherwise,
-        # create but DON'T put it into the shortest_paths_dict.
-        nb_node_hash = Node.__hash__(
-            self=None,
-            coord=nb_node_coord,
-            mtx_shape=curr_node.mtx_shape
+        Returns
+        -------
+        int
+            Number of cells that were invalidated and recomputed.
+
+        """
+        num_rows, num_cols = self.shape
+        distances = self.distances.reshape(-1)
+        predecessors = self.predecessors.reshape(-1)
+        landing_zones = self.landing_zones.reshape(-1)
+
+        neighbour_offsets = [di * num_cols + dj for di, dj in BASE_NEIGHBOURS]
+        edge_costs = self.edge_costs.reshape(-1, len(BASE_NEIGHBOURS))
+
+        affected = set()
+        for i, j, new_label, new_height in changed_cells:
+            self.adj_matrix[i, j] = new_label
+            self.height_map[i, j] = new_height
+            affected.add(self.flat_index((i, j)))
+        for idx in affected:
+            self._refresh_edge_costs(*divmod(idx, num_cols))
+        # Collect every cell whose next hops go through a changed cell.
+        stack = list(affected)
+        while stack:
+            idx = stack.pop()
+            for offset, cost in zip(neighbour_offsets,
+                                    edge_costs[idx].tolist()):
+                if np.isinf(cost):
+                    continue
+                nb_idx = idx + offset
+                if predecessors[nb_idx] == idx and nb_idx not in affected:
+                    affected.add(nb_idx)
+                    stack.append(nb_idx)
+        for idx in affected:
+            distances[idx] = np.inf
+            predecessors[idx] = -1
+            landing_zones[idx] = -1
+
+        # Seed the invalidated cells from their valid neighbours. Costs are
+        # symmetric, so the step to a neighbour costs the same as back.
+        heap = []
+        for idx in affected:
+            label = self.adj_matrix.reshape(-1)[idx]
+            if not can_a_person_reach(label):
+                continue
+            if can_uav_land(label):
+                distances[idx] = 0
+                landing_zones[idx] = idx
+                heap.append((0.0, idx))
+                continue
+            for offset, cost in zip(neighbour_offsets,
+                                    edge_costs[idx].tolist()):
+                nb_idx = idx + offset
+                if (np.isinf(cost) or nb_idx in affected
+                        or np.isinf(distances[nb_idx])):
+                    continue
+                distance = float(distances[nb_idx]) + cost
+                if distance < distances[idx]:
+                    distances[idx] = distance
+                    predecessors[idx] = nb_idx
+                    landing_zones[idx] = landing_zones[nb_idx]
+            if not np.isinf(distances[idx]):
+                heap.append((float(distances[idx]), idx))
+        heapq.heapify(heap)
+        grid_dijkstra(
+            edge_costs=self.edge_costs,
+            state=self,
+            heap=heap,
+            landing_zones=landing_zones,
         )
-        node_was_here_before = nb_node_hash in shortest_paths_dict
-        if node_was_here_before:
-            nb_node = shortest_paths_dict[nb_node_hash]
-        else:
-            nb_node = Node(
-                coord=nb_node_coord,
-                mtx_shape=curr_node.mtx_shape,
-                height=height_map[nb_node_coord[0]][nb_node_coord[1]],
-                label=nb_node_label,
-            )
-        # Calculate the distance from the person to the node.
-        nb_node_distance = curr_node.distance + \
-            distance_between_3d_points(
-                curr_node.coord[0], curr_node.coord[1], abs(curr_node.height),
-                nb_node.coord[0], nb_node.coord[1], abs(nb_node.height)
+        return len(affected)
+
+    def _refresh_edge_costs(self, i, j):
+        """Recompute the edge costs of the cells around (i, j) after it changed.
+
+        Parameters
+        ----------
+        i : int
+            Row of the changed cell.
+        j : int
+            Column of the changed cell.
+
+        """
+        num_rows, num_cols = self.shape
+        # The window must include the neighbours of the cells to refresh.
+        row_start, row_stop = max(0, i - 2), min(num_rows, i + 3)
+        col_start, col_stop = max(0, j - 2), min(num_cols, j + 3)
+        window_edge_costs = compute_edge_costs(
+            self.adj_matrix[row_start:row_stop, col_start:col_stop],
+            self.height_map[row_start:row_stop, col_start:col_stop],
+        )
+        rows = slice(max(0, i - 1), min(num_rows, i + 2))
+        cols = slice(max(0, j - 1), min(num_cols, j + 2))
+        self.edge_costs[rows, cols] = window_edge_costs[
+            rows.start - row_start:rows.stop - row_start,
+            cols.start - col_start:cols.stop - col_start,
+        ]
+
+    def query(self, person_coord):
+        """Find the landing zone closest to the person. Costs O(path length).
+
+        People standing on a landing zone or on a cell they could not walk
+        to are not covered by the field, so they fall back to
+        find_landing_zone.
+
+        Parameters
+        ----------
+        person_coord : list
+            (x, y) coordinate in the adj_matrix of the person supposed to receive supplies or deliveries.
+
+        Returns
+        -------
+        (list, int)
+            Returns the shortest_path and the shortest_distance as a tuple.
+
+        """
+        label = self.adj_matrix[person_coord[0], person_coord[1]]
+        if can_uav_land(label) or not can_a_person_reach(label):
+            return find_landing_zone(
+                person_coord=person_coord,
+                adj_matrix=self.adj_matrix,
+                height_map=self.height_map,
+                edge_costs=self.edge_costs,
             )
-        # Check if the calculated distance is shorter than the prev distance.
-        # If so, update the values inside nb_node.
-        if node_was_here_before:
-            if (nb_node_distance > nb_node.distance)\
-                    and (not nb_node.distance == -1):
-                continue
-        else:
-            shortest_paths_dict[nb_node_hash] = nb_node
-        nb_node.distance = nb_node_distance
-        nb_node.path = curr_node.path + [nb_node.coord]
-        shortest_paths_dict[nb_node.hash] = nb_node
-        find_landing_zone_re(
-            curr_node=nb_node,
+        idx = self.flat_index(person_coord)
+        distance = float(self.distances.reshape(-1)[idx])
+        if np.isinf(distance):
+            return [], -1
+        predecessors = self.predecessors.reshape(-1)
+        shortest_path = []
+        while idx != -1:
+            shortest_path.append(list(divmod(idx, self.shape[1])))
+            idx = int(predecessors[idx])
+        return shortest_path, distance
+
+
+def find_landing_zones(person_coord_list, adj_matrix, height_map,
+                       backend='python'):
+    """Find the closest landing zone of every person with a single search.
+
+    Parameters
+    ----------
+    person_coord_list : list of lists
+        (x, y) coordinates in the adj_matrix of the people supposed to receive supplies or deliveries.
+    adj_matrix : numpy.ndarray
+        Adjacent matrix where the meaning of each value is specified in the label_utils.py module.
+    height_map : numpy.ndarray
+        Depth estimation of the frame. Same shape as the adj_matrix.
+    backend : str
+        'python' builds a LandingZoneField. 'scipy' runs scipy.sparse.csgraph.dijkstra once with every landing zone as a source.
+
+    Returns
+    -------
+    list
+        (shortest_path, shortest_distance) tuple of each person, in the same order as person_coord_list.
+
+    """
+    if backend == 'scipy':
+        from landing_zone_detection.sparse_utils import \
+            find_landing_zones_sparse
+        return find_landing_zones_sparse(
+            person_coord_list=person_coord_list,
             adj_matrix=adj_matrix,
             height_map=height_map,
-            shortest_paths_dict=shortest_paths_dict,
-            base_neighbours=base_neighbours
         )
-        shortest_paths_dict[nb_node.hash] = nb_node
+    elif backend != 'python':
+        raise ValueError('Unknown backend: {}'.format(backend))
+    field = LandingZoneField(adj_matrix=adj_matrix, height_map=height_map)
+    return [field.query(person_coord) for person_coord in person_coord_list]
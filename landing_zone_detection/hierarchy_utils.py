@@ -0,0 +1,422 @@
+import heapq
+
+import numpy as np
+from landing_zone_detection.graph_utils import BASE_NEIGHBOURS, \
+    SearchState, compute_edge_costs, find_landing_zone, grid_dijkstra, \
+    landing_zone_heuristic, window_edge_costs
+from landing_zone_detection.label_utils import can_a_person_reach, \
+    can_uav_land
+
+# Directions that cover every undirected edge of the 8-connected grid once.
+FORWARD_NEIGHBOURS = [[1, 0], [0, 1], [1, 1], [1, -1]]
+
+
+class PathHierarchy(object):
+    """Hierarchical abstraction (HPA*) of an adj_matrix for fast landing zone queries on very large maps.
+
+    The grid is split in square clusters. Walkable cells on both sides of a
+    cluster border become entrances, one pair per contiguous stretch of the
+    border, and the abstract graph links them with the 3D step cost between
+    clusters. Inside each cluster, a single search seeded from every
+    entrance and landing zone at once splits the cells by their closest
+    seed, and seeds whose regions touch are linked with the cost of the path
+    through the touching cells. Those costs are upper bounds of the shortest
+    paths, which only guide the queries. Building it is the expensive step,
+    so build it once per map, i.e with a LandingZoneCache.
+
+    Parameters
+    ----------
+    adj_matrix : numpy.ndarray
+        Adjacent matrix where the meaning of each value is specified in the label_utils.py module.
+    height_map : numpy.ndarray
+        Depth estimation of the frame. Same shape as the adj_matrix.
+    cluster_size : int
+        Number of rows and columns of each cluster.
+
+    Attributes
+    ----------
+    entrances : numpy.ndarray
+        Flat index of each abstract node.
+    abstract_edges : list
+        List of (cost, node) tuples leaving each abstract node.
+    landing_zone_costs : numpy.ndarray
+        Cost of a path from each abstract node to a landing zone of its cluster. inf if there's none.
+    edge_costs : numpy.ndarray
+        compute_edge_costs of the whole map.
+    heuristic : numpy.ndarray
+        landing_zone_heuristic of the whole map.
+
+    """
+
+    def __init__(self, adj_matrix, height_map, cluster_size=16):
+        self.adj_matrix = np.array(adj_matrix)
+        self.height_map = np.array(height_map)
+        self.cluster_size = cluster_size
+        self.shape = self.adj_matrix.shape[:2]
+        num_rows, num_cols = self.shape
+        self.edge_costs = compute_edge_costs(self.adj_matrix, self.height_map)
+        self.heuristic = landing_zone_heuristic(self.adj_matrix)
+
+        # Cross-cluster edges between walkable cells.
+        rows, cols = np.indices(self.shape)
+        clusters = self._cluster_of(rows, cols)
+        walkable = can_a_person_reach(self.adj_matrix)
+        stretches = {}
+        for di, dj in FORWARD_NEIGHBOURS:
+            k = BASE_NEIGHBOURS.index([di, dj])
+            src = (slice(0, num_rows - di),
+                   slice(max(0, -dj), num_cols - max(0, dj)))
+            dst = (slice(di, num_rows),
+                   slice(max(0, dj), num_cols - max(0, -dj)))
+            crossing = (clusters[src] != clusters[dst]) \
+                & walkable[src] & walkable[dst]
+            src_i, src_j = rows[src][crossing], cols[src][crossing]
+            costs = self.edge_costs[src_i, src_j, k]
+            for i, j, cost in zip(src_i.tolist(), src_j.tolist(),
+                                  costs.tolist()):
+                key = (self._cluster_of(i, j),
+                       self._cluster_of(i + di, j + dj))
+                # Position along the border, to split it in stretches. It's
+                # the row if both clusters are side by side.
+                same_cluster_row = \
+                    i // cluster_size == (i + di) // cluster_size
+                position = i if same_cluster_row else j
+                stretches.setdefault(key, []).append(
+                    (position, i, j, i + di, j + dj, cost)
+                )
+
+        node_of = {}
+        inter_edges = []
+        for key in sorted(stretches):
+            crossings = sorted(stretches[key])
+            start = 0
+            for k in range(1, len(crossings) + 1):
+                if k < len(crossings) \
+                        and crossings[k][0] - crossings[k - 1][0] <= 1:
+                    continue
+                # One entrance pair in the middle of each stretch.
+                _, i, j, nb_i, nb_j, cost = crossings[(start + k - 1) // 2]
+                idx = node_of.setdefault(i * num_cols + j, len(node_of))
+                nb_idx = node_of.setdefault(nb_i * num_cols + nb_j,
+                                            len(node_of))
+                inter_edges.append((idx, nb_idx, cost))
+                start = k
+
+        self.entrances = np.zeros(len(node_of), dtype=np.int64)
+        for flat_idx, node in node_of.items():
+            self.entrances[node] = flat_idx
+        self.abstract_edges = [[] for _ in range(len(node_of))]
+        for idx, nb_idx, cost in inter_edges:
+            self.abstract_edges[idx].append((cost, nb_idx))
+            self.abstract_edges[nb_idx].append((cost, idx))
+
+        # Intra-cluster edges and costs to the landing zones.
+        self.landing_zone_costs = np.full(len(node_of), np.inf)
+        nodes_by_cluster = {}
+        for node, flat_idx in enumerate(self.entrances.tolist()):
+            cluster = self._cluster_of(*divmod(flat_idx, num_cols))
+            nodes_by_cluster.setdefault(cluster, []).append(node)
+        for cluster, nodes in nodes_by_cluster.items():
+            self._link_cluster(cluster, nodes)
+
+    def _link_cluster(self, cluster, nodes):
+        """Add the abstract edges between the entrances of a cluster, and their landing zone costs.
+
+        Parameters
+        ----------
+        cluster : int
+            Cluster id.
+        nodes : list
+            Abstract nodes of the entrances of the cluster.
+
+        """
+        window = self._cluster_window(cluster)
+        edge_costs = window_edge_costs(self.edge_costs, *window)
+        state = SearchState(edge_costs.shape[:2])
+        num_rows, num_cols = state.shape
+        distances = state.distances.reshape(-1)
+        # Closest seed of each cell. Landing zones share the label past the
+        # last abstract node.
+        landing_zone = len(self.entrances)
+        seeds = np.full(num_rows * num_cols, -1, dtype=np.int32)
+        landing_zone_idxs = np.flatnonzero(
+            can_uav_land(self.adj_matrix[window])
+        )
+        seeds[landing_zone_idxs] = landing_zone
+        local_idxs = [self._local_index(self.entrances[node], window)
+                      for node in nodes]
+        for node, local_idx in zip(nodes, local_idxs):
+            if seeds[local_idx] == landing_zone:
+                self.landing_zone_costs[node] = 0.0
+            seeds[local_idx] = node
+        seed_idxs = np.flatnonzero(seeds != -1)
+        distances[seed_idxs] = 0
+        grid_dijkstra(
+            edge_costs=edge_costs,
+            state=state,
+            heap=[(0.0, idx) for idx in seed_idxs.tolist()],
+            landing_zones=seeds,
+        )
+
+        # Paths through the steps between cells of different seeds.
+        seeds = seeds.reshape(state.shape)
+        distances = state.distances.astype(np.float64)
+        pairs, costs = [], []
+        for di, dj in FORWARD_NEIGHBOURS:
+            src = (slice(0, num_rows - di),
+                   slice(max(0, -dj), num_cols - max(0, dj)))
+            dst = (slice(di, num_rows),
+                   slice(max(0, dj), num_cols - max(0, -dj)))
+            step_costs = edge_costs[src + (
+                BASE_NEIGHBOURS.index([di, dj]),
+            )]
+            touching = (seeds[src] != seeds[dst]) & (seeds[src] != -1) \
+                & (seeds[dst] != -1) & np.isfinite(step_costs)
+            src_seeds, dst_seeds = seeds[src][touching], seeds[dst][touching]
+            pairs.append(np.stack([np.minimum(src_seeds, dst_seeds),
+                                   np.maximum(src_seeds, dst_seeds)]))
+            costs.append(distances[src][touching] + step_costs[touching]
+                         + distances[dst][touching])
+        pairs = np.concatenate(pairs, axis=1)
+        costs = np.concatenate(costs)
+        # Keep the cheapest path between each pair of seeds.
+        order = np.lexsort((costs, pairs[1], pairs[0]))
+        pairs, costs = pairs[:, order], costs[order]
+        first = np.ones(len(costs), dtype=bool)
+        first[1:] = (pairs[:, 1:] != pairs[:, :-1]).any(axis=0)
+        for node, nb_node, cost in zip(pairs[0][first].tolist(),
+                                       pairs[1][first].tolist(),
+                                       costs[first].tolist()):
+            if nb_node == landing_zone:
+                self.landing_zone_costs[node] = min(
+                    self.landing_zone_costs[node], cost
+                )
+            else:
+                self.abstract_edges[node].append((cost, nb_node))
+                self.abstract_edges[nb_node].append((cost, node))
+
+    @property
+    def nbytes(self):
+        """Approximate memory used by the hierarchy, in bytes."""
+        num_edges = sum(len(edges) for edges in self.abstract_edges)
+        return (self.adj_matrix.nbytes + self.height_map.nbytes
+                + self.edge_costs.nbytes + self.heuristic.nbytes
+                + self.entrances.nbytes + self.landing_zone_costs.nbytes
+                + 16 * num_edges)
+
+    def _cluster_of(self, i, j):
+        """Cluster id of the cell (i, j). Works element-wise on arrays."""
+        num_cluster_cols = -(-self.shape[1] // self.cluster_size)
+        return (i // self.cluster_size) * num_cluster_cols \
+            + j // self.cluster_size
+
+    def _cluster_window(self, cluster):
+        """Slices of the adj_matrix covered by a cluster."""
+        num_cluster_cols = -(-self.shape[1] // self.cluster_size)
+        cluster_i, cluster_j = divmod(cluster, num_cluster_cols)
+        return (slice(cluster_i * self.cluster_size,
+                      (cluster_i + 1) * self.cluster_size),
+                slice(cluster_j * self.cluster_size,
+                      (cluster_j + 1) * self.cluster_size))
+
+    def _local_index(self, flat_idx, window):
+        """Flat index of a cell inside a window of the adj_matrix."""
+        i, j = divmod(int(flat_idx), self.shape[1])
+        window_cols = min(window[1].stop, self.shape[1]) - window[1].start
+        return (i - window[0].start) * window_cols + (j - window[1].start)
+
+    def _abstract_search(self, person_coord):
+        """Search the abstract graph from the person.
+
+        Returns
+        -------
+        set
+            Clusters crossed by the abstract path to the closest landing zone, or None if there isn't one.
+
+        """
+        person_cluster = self._cluster_of(*person_coord)
+        window = self._cluster_window(person_cluster)
+        edge_costs = window_edge_costs(self.edge_costs, *window)
+        state = SearchState(edge_costs.shape[:2])
+        person_local_idx = self._local_index(
+            person_coord[0] * self.shape[1] + person_coord[1], window
+        )
+        state.distances.reshape(-1)[person_local_idx] = 0
+        grid_dijkstra(
+            edge_costs=edge_costs,
+            state=state,
+            heap=[(0.0, person_local_idx)],
+        )
+        distances = state.distances.reshape(-1)
+
+        # Node -1 stands for the goal, reached through any landing zone,
+        # and -2 for the person.
+        goal = -1
+        heap = []
+        landing_zones = np.flatnonzero(can_uav_land(self.adj_matrix[window]))
+        landing_zones = landing_zones[landing_zones != person_local_idx]
+        if len(landing_zones) and \
+                not np.isinf(distances[landing_zones].min()):
+            heap.append((float(distances[landing_zones].min()), goal, -2))
+        for node in np.flatnonzero(
+                self._cluster_of(*np.divmod(self.entrances, self.shape[1]))
+                == person_cluster).tolist():
+            distance = float(distances[
+                self._local_index(self.entrances[node], window)
+            ])
+            if not np.isinf(distance):
+                heap.append((distance, node, -2))
+        heapq.heapify(heap)
+
+        previous = {}
+        while heap:
+            distance, node, previous_node = heapq.heappop(heap)
+            if node in previous:
+                continue
+            previous[node] = previous_node
+            if node == goal:
+                break
+            if not np.isinf(self.landing_zone_costs[node]):
+                heapq.heappush(heap, (
+                    distance + self.landing_zone_costs[node], goal, node
+                ))
+            for cost, nb_node in self.abstract_edges[node]:
+                if nb_node not in previous:
+                    heapq.heappush(heap, (distance + cost, nb_node, node))
+        if goal not in previous:
+            return None
+        corridor = {person_cluster}
+        node = previous[goal]
+        while node >= 0:
+            corridor.add(self._cluster_of(
+                *divmod(int(self.entrances[node]), self.shape[1])
+            ))
+            node = previous[node]
+        return corridor
+
+    def find_landing_zone(self, person_coord, algorithm='astar'):
+        """Find the landing zone closest to the person using the hierarchy.
+
+        The abstract graph picks a corridor of clusters, and the path is
+        refined with a search restricted to the cells of that corridor. A
+        path that leaves the corridor costs at least the distance to where
+        it leaves plus the heuristic from there, so while some of those
+        bounds is below the refined distance, the clusters they lead to join
+        the corridor and the refinement runs again. The result is therefore
+        always the shortest path. If the abstract graph finds no landing
+        zone, the search falls back to a flat find_landing_zone.
+
+        Parameters
+        ----------
+        person_coord : list
+            (x, y) coordinate in the adj_matrix of the person supposed to receive supplies or deliveries.
+        algorithm : str
+            Algorithm of the refinement, 'dijkstra' or 'astar'.
+
+        Returns
+        -------
+        (list, int)
+            Returns the shortest_path and the shortest_distance as a tuple.
+
+        """
+        if algorithm not in ('dijkstra', 'astar'):
+            raise ValueError('Unknown algorithm: {}'.format(algorithm))
+        person_coord = (int(person_coord[0]), int(person_coord[1]))
+        corridor = self._abstract_search(person_coord)
+        if corridor is None:
+            return self._find_landing_zone_flat(person_coord, algorithm)
+        while True:
+            shortest_path, shortest_distance, missing = self._refine(
+                person_coord, corridor, algorithm
+            )
+            if not missing:
+                return shortest_path, shortest_distance
+            corridor |= missing
+
+    def _refine(self, person_coord, corridor, algorithm):
+        """Search the closest landing zone over the cells of a corridor.
+
+        Returns
+        -------
+        (list, int, set)
+            shortest_path and shortest_distance inside the corridor, as returned by find_landing_zone, and the clusters outside it that may hold a shorter path.
+
+        """
+        windows = [self._cluster_window(cluster) for cluster in corridor]
+        rows = slice(min(window[0].start for window in windows),
+                     min(max(window[0].stop for window in windows),
+                         self.shape[0]))
+        cols = slice(min(window[1].start for window in windows),
+                     min(max(window[1].stop for window in windows),
+                         self.shape[1]))
+        region = np.zeros((rows.stop - rows.start, cols.stop - cols.start),
+                          dtype=bool)
+        for window in windows:
+            region[window[0].start - rows.start:window[0].stop - rows.start,
+                   window[1].start - cols.start:window[1].stop - cols.start] \
+                = True
+        state = SearchState(region.shape)
+        person_idx = state.flat_index((person_coord[0] - rows.start,
+                                       person_coord[1] - cols.start))
+        state.distances.reshape(-1)[person_idx] = 0
+        is_landing_zone = can_uav_land(self.adj_matrix[rows, cols]) \
+            .reshape(-1)
+        heuristic = None
+        if algorithm == 'astar':
+            heuristic = self.heuristic[rows, cols].astype(np.float64) \
+                .reshape(-1)
+
+        def is_goal(idx):
+            # The person's own position is never a landing zone.
+            return idx != person_idx and is_landing_zone[idx]
+
+        landing_zone_idx = grid_dijkstra(
+            edge_costs=window_edge_costs(self.edge_costs, rows, cols,
+                                         region),
+            state=state,
+            heap=[(0.0 if heuristic is None else heuristic[person_idx],
+                   person_idx)],
+            is_goal=is_goal,
+            heuristic=heuristic,
+        )
+        if landing_zone_idx == -1:
+            shortest_path, shortest_distance = [], -1
+            bound = np.inf
+        else:
+            landing_zone_coord = divmod(landing_zone_idx, state.shape[1])
+            shortest_path = [
+                [i + rows.start, j + cols.start]
+                for i, j in state.path_to(landing_zone_coord)
+            ]
+            shortest_distance = float(state.distances[landing_zone_coord])
+            bound = shortest_distance
+
+        # Every cell on a shorter path is expanded before the landing zone,
+        # so its distance is exact. The bounds of the rest are only higher.
+        reached_i, reached_j = np.nonzero(np.isfinite(state.distances))
+        distances = state.distances[reached_i, reached_j].astype(np.float64)
+        reached_i, reached_j = reached_i + rows.start, reached_j + cols.start
+        corridor_clusters = np.array(sorted(corridor))
+        missing = set()
+        for k, (di, dj) in enumerate(BASE_NEIGHBOURS):
+            step_costs = self.edge_costs[reached_i, reached_j, k]
+            # Steps to coords that do not exist cost inf.
+            nb_i = np.clip(reached_i + di, 0, self.shape[0] - 1)
+            nb_j = np.clip(reached_j + dj, 0, self.shape[1] - 1)
+            nb_clusters = self._cluster_of(nb_i, nb_j)
+            leaving = ~np.isin(nb_clusters, corridor_clusters) & (
+                distances + step_costs + self.heuristic[nb_i, nb_j] < bound
+            )
+            missing.update(nb_clusters[leaving].tolist())
+        return shortest_path, shortest_distance, missing
+
+    def _find_landing_zone_flat(self, person_coord, algorithm):
+        """find_landing_zone over the whole map, when the hierarchy can't answer."""
+        return find_landing_zone(
+            person_coord=list(person_coord),
+            adj_matrix=self.adj_matrix,
+            height_map=self.height_map,
+            algorithm=algorithm,
+            heuristic=self.heuristic,
+            edge_costs=self.edge_costs,
+        )
@@ -8,12 +8,12 @@ def can_uav_land(label):
 
     Parameters
     ----------
-    label : int
-        Label of a position in the image.
+    label : int or numpy.ndarray
+        Label of a position in the image, or an array of labels.
 
     Returns
     -------
-    boolean
+    boolean or numpy.ndarray
         Whether an UAV can reach a position labelled with "label".
 
     """
@@ -25,14 +25,15 @@ def can_a_person_reach(label):
 
     Parameters
     ----------
-    label : int
-        Label of a position in the image.
+    label : int or numpy.ndarray
+        Label of a position in the image, or an array of labels.
 
     Returns
     -------
-    bool
+    bool or numpy.ndarray
         Whether a person can reach a position labelled with "label".
 
     """
-    return label == UAV_CAN_LAND_PERSON_CAN_REACH or \
-        label == UAV_CANNOT_LAND_PERSON_CAN_REACH
+    # Bitwise or, so it also works element-wise on label arrays.
+    return (label == UAV_CAN_LAND_PERSON_CAN_REACH) | \
+        (label == UAV_CANNOT_LAND_PERSON_CAN_REACH)
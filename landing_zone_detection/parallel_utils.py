@@ -0,0 +1,100 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+from landing_zone_detection.graph_utils import compute_edge_costs, \
+    find_landing_zone, landing_zone_heuristic
+
+# Arrays attached by each worker process, see _attach_shared_arrays.
+_shared_arrays = {}
+_shared_memories = []
+
+
+def _attach_shared_arrays(array_specs):
+    """Initializer of the worker processes. Maps the shared arrays without copying them.
+
+    Parameters
+    ----------
+    array_specs : dict
+        (shared memory name, shape, dtype) of each array, by argument name.
+
+    """
+    for key, (name, shape, dtype) in array_specs.items():
+        shm = shared_memory.SharedMemory(name=name)
+        # Keep the SharedMemory alive as long as the array is used.
+        _shared_memories.append(shm)
+        array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        array.flags.writeable = False
+        _shared_arrays[key] = array
+
+
+def _find_landing_zone_shared(person_coord, algorithm):
+    """find_landing_zone over the arrays attached by _attach_shared_arrays."""
+    return find_landing_zone(
+        person_coord=person_coord,
+        algorithm=algorithm,
+        **_shared_arrays
+    )
+
+
+def find_landing_zones_parallel(person_coord_list, adj_matrix, height_map,
+                                algorithm='dijkstra', max_workers=None,
+                                chunksize=16):
+    """Find the closest landing zone of every person, fanning the queries out to a process pool.
+
+    The adj_matrix, the height_map and everything precomputed from them are
+    placed once in shared memory, so the workers map them instead of
+    receiving a pickled copy with each task.
+
+    Parameters
+    ----------
+    person_coord_list : list of lists
+        (x, y) coordinates in the adj_matrix of the people supposed to receive supplies or deliveries.
+    adj_matrix : numpy.ndarray
+        Adjacent matrix where the meaning of each value is specified in the label_utils.py module.
+    height_map : numpy.ndarray
+        Depth estimation of the frame. Same shape as the adj_matrix.
+    algorithm : str
+        'dijkstra' or 'astar', see find_landing_zone.
+    max_workers : int
+        Number of worker processes. Defaults to the number of CPUs.
+    chunksize : int
+        Number of people sent to a worker at a time.
+
+    Returns
+    -------
+    list
+        (shortest_path, shortest_distance) tuple of each person, in the same order as person_coord_list.
+
+    """
+    arrays = {
+        'adj_matrix': np.asarray(adj_matrix),
+        'height_map': np.asarray(height_map),
+        'edge_costs': compute_edge_costs(adj_matrix, height_map),
+    }
+    if algorithm == 'astar':
+        arrays['heuristic'] = landing_zone_heuristic(adj_matrix)
+
+    shms = []
+    array_specs = {}
+    try:
+        for key, array in arrays.items():
+            shm = shared_memory.SharedMemory(create=True,
+                                             size=max(1, array.nbytes))
+            shms.append(shm)
+            np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[:] = \
+                array
+            array_specs[key] = (shm.name, array.shape, array.dtype)
+        with ProcessPoolExecutor(max_workers=max_workers,
+                                 initializer=_attach_shared_arrays,
+                                 initargs=(array_specs,)) as executor:
+            return list(executor.map(
+                _find_landing_zone_shared,
+                person_coord_list,
+                [algorithm] * len(person_coord_list),
+                chunksize=chunksize,
+            ))
+    finally:
+        for shm in shms:
+            shm.close()
+            shm.unlink()
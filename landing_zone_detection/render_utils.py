@@ -0,0 +1,206 @@
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+# BGR colors of the overlays.
+LANDING_ZONE_PATH_COLOR = (0, 0, 255)
+ROUTE_COLORS = [(255, 128, 0), (0, 200, 255), (255, 0, 255), (0, 255, 0),
+                (255, 255, 0), (128, 0, 255)]
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv')
+
+
+class SnapshotRenderer(object):
+    """Headless renderer of scenario snapshots to a PNG sequence or a video.
+
+    Each snapshot is the frame with the landing zone paths and the routes
+    drawn on top with OpenCV. The frame is copied into one of a few
+    reusable buffers, so the caller's arrays are never modified, and the
+    drawing and encoding run in a background thread pool. When every
+    buffer is in use, submit waits for one to be written, which bounds the
+    memory. Use it as a context manager, or call close, to wait for the
+    pending snapshots.
+
+    Parameters
+    ----------
+    output : str
+        Directory of the PNG sequence, or path of a video file (.mp4, .avi or .mkv).
+    col_size : int
+        Height in pixels of each adj_matrix item, like in the frame of an AerialImageData.
+    row_size : int
+        Width in pixels of each adj_matrix item.
+    max_workers : int
+        Number of writer threads. Videos are always written by a single thread, in order.
+    fps : float
+        Frames per second of the video.
+    fourcc : str
+        Codec of the video.
+    thickness : int
+        Thickness of the lines, in pixels.
+
+    Attributes
+    ----------
+    num_written : int
+        Number of snapshots written so far.
+
+    """
+
+    def __init__(self, output, col_size=32, row_size=32, max_workers=4,
+                 fps=10, fourcc='mp4v', thickness=2):
+        self.output = output
+        self.col_size = col_size
+        self.row_size = row_size
+        self.fps = fps
+        self.fourcc = fourcc
+        self.thickness = thickness
+        self.num_written = 0
+        self.is_video = output.lower().endswith(VIDEO_EXTENSIONS)
+        if not self.is_video:
+            os.makedirs(output, exist_ok=True)
+        self._video_writer = None
+        num_threads = 1 if self.is_video else max_workers
+        self._executor = ThreadPoolExecutor(max_workers=num_threads)
+        # One spare buffer per thread, so the caller can copy the next frame
+        # while the others are drawn and written.
+        self._free_buffers = queue.Queue()
+        self._num_buffers = 0
+        self._max_buffers = num_threads + 1
+        self._futures = []
+        self._lock = threading.Lock()
+        self._num_submitted = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _acquire_buffer(self, frame):
+        """Free buffer with the shape and dtype of the frame."""
+        try:
+            buffer = self._free_buffers.get_nowait()
+        except queue.Empty:
+            if self._num_buffers < self._max_buffers:
+                self._num_buffers += 1
+                return np.empty_like(frame)
+            buffer = self._free_buffers.get()
+        if buffer.shape == frame.shape and buffer.dtype == frame.dtype:
+            return buffer
+        # Frame of another size, replace the buffer.
+        return np.empty_like(frame)
+
+    def _points(self, coord_list):
+        """Pixel (x, y) of the center of each adj_matrix item, as cv2 expects."""
+        coords = np.asarray(coord_list, dtype=np.int32).reshape(-1, 2)
+        return np.stack([
+            coords[:, 1] * self.row_size + self.row_size // 2,
+            coords[:, 0] * self.col_size + self.col_size // 2,
+        ], axis=1)
+
+    def draw(self, buffer, landing_zone_paths=(), routes=()):
+        """Draw the overlays of a snapshot into an image, in place.
+
+        Parameters
+        ----------
+        buffer : numpy.ndarray
+            Image to draw into, i.e a copy of the frame.
+        landing_zone_paths : list
+            Shortest paths returned by find_landing_zone. The landing zone at the end of each path is circled.
+        routes : list
+            Routes returned by find_routes.
+
+        Returns
+        -------
+        numpy.ndarray
+            buffer.
+
+        """
+        radius = max(1, min(self.col_size, self.row_size) // 3)
+        for k, route in enumerate(routes):
+            cv2.polylines(buffer, [self._points(route)], isClosed=False,
+                          color=ROUTE_COLORS[k % len(ROUTE_COLORS)],
+                          thickness=self.thickness)
+        for path in landing_zone_paths:
+            if not len(path):
+                continue
+            points = self._points(path)
+            cv2.polylines(buffer, [points], isClosed=False,
+                          color=LANDING_ZONE_PATH_COLOR,
+                          thickness=self.thickness)
+            cv2.circle(buffer, tuple(int(x) for x in points[-1]), radius,
+                       color=LANDING_ZONE_PATH_COLOR,
+                       thickness=self.thickness)
+        return buffer
+
+    def submit(self, frame, landing_zone_paths=(), routes=(), filename=None):
+        """Queue a snapshot to be drawn and written in the background.
+
+        Parameters
+        ----------
+        frame : numpy.ndarray
+            BGR frame, i.e AerialImageData.frame. It's copied, never modified.
+        landing_zone_paths : list
+            Shortest paths returned by find_landing_zone.
+        routes : list
+            Routes returned by find_routes.
+        filename : str
+            Name of the PNG inside the output directory. Defaults to snapshot_<number>.png. Ignored for videos.
+
+        """
+        frame = np.asarray(frame)
+        buffer = self._acquire_buffer(frame)
+        np.copyto(buffer, frame)
+        # Copy the overlays too, so the caller can reuse its lists.
+        landing_zone_paths = [self._copy_coords(path)
+                              for path in landing_zone_paths]
+        routes = [self._copy_coords(route) for route in routes]
+        if filename is None:
+            filename = 'snapshot_{:06d}.png'.format(self._num_submitted)
+        self._num_submitted += 1
+        self._futures.append(self._executor.submit(
+            self._write, buffer, landing_zone_paths, routes, filename
+        ))
+        # Surface errors of finished writes early, and forget them.
+        futures = []
+        for future in self._futures:
+            if future.done():
+                future.result()
+            else:
+                futures.append(future)
+        self._futures = futures
+
+    @staticmethod
+    def _copy_coords(coord_list):
+        return np.array(coord_list, dtype=np.int32).reshape(-1, 2)
+
+    def _write(self, buffer, landing_zone_paths, routes, filename):
+        """Draw and write a snapshot. Runs in a writer thread."""
+        try:
+            self.draw(buffer, landing_zone_paths, routes)
+            if self.is_video:
+                if self._video_writer is None:
+                    self._video_writer = cv2.VideoWriter(
+                        self.output, cv2.VideoWriter_fourcc(*self.fourcc),
+                        self.fps, (buffer.shape[1], buffer.shape[0])
+                    )
+                self._video_writer.write(buffer)
+            elif not cv2.imwrite(os.path.join(self.output, filename),
+                                 buffer):
+                raise IOError('Cannot write the snapshot {}'.format(filename))
+            with self._lock:
+                self.num_written += 1
+        finally:
+            self._free_buffers.put(buffer)
+
+    def close(self):
+        """Wait for the pending snapshots and close the video."""
+        self._executor.shutdown(wait=True)
+        futures, self._futures = self._futures, []
+        if self._video_writer is not None:
+            self._video_writer.release()
+            self._video_writer = None
+        for future in futures:
+            future.result()
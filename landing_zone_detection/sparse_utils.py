@@ -0,0 +1,194 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from landing_zone_detection.graph_utils import BASE_NEIGHBOURS, \
+    compute_edge_costs, window_edge_costs
+from landing_zone_detection.label_utils import can_uav_land
+
+
+def edge_costs_to_csr(edge_costs, reverse=False):
+    """Convert the 8-connected walkable grid to a sparse adjacency matrix.
+
+    Parameters
+    ----------
+    edge_costs : numpy.ndarray
+        Output of compute_edge_costs.
+    reverse : bool
+        Whether to reverse every edge, i.e to search from the landing zones towards the people. Steps are only allowed onto walkable cells, so the grid isn't symmetric.
+
+    Returns
+    -------
+    scipy.sparse.csr_matrix
+        (num_cells, num_cells) matrix where the value at (u, v) is the cost of the step from the flat index u to the flat index v.
+
+    """
+    num_rows, num_cols = edge_costs.shape[:2]
+    num_cells = num_rows * num_cols
+    neighbour_offsets = np.asarray(
+        [di * num_cols + dj for di, dj in BASE_NEIGHBOURS]
+    )
+    if reverse:
+        # The step from u to its neighbour v in direction k becomes the
+        # step from v back to u, stored at v.
+        reverse_costs = np.full_like(edge_costs, np.inf)
+        for k, (di, dj) in enumerate(BASE_NEIGHBOURS):
+            src = (slice(max(0, -di), num_rows - max(0, di)),
+                   slice(max(0, -dj), num_cols - max(0, dj)))
+            dst = (slice(max(0, di), num_rows - max(0, -di)),
+                   slice(max(0, dj), num_cols - max(0, -dj)))
+            reverse_costs[dst + (k,)] = edge_costs[src + (k,)]
+        edge_costs = reverse_costs
+        neighbour_offsets = -neighbour_offsets
+    edge_costs = edge_costs.reshape(num_cells, len(BASE_NEIGHBOURS))
+    is_edge = np.isfinite(edge_costs)
+    # np.nonzero is row-major, so the edges already come sorted by source.
+    sources, directions = np.nonzero(is_edge)
+    indptr = np.zeros(num_cells + 1, dtype=np.int64)
+    np.cumsum(is_edge.sum(axis=1), out=indptr[1:])
+    return csr_matrix(
+        (
+            edge_costs[sources, directions],
+            sources + neighbour_offsets[directions],
+            indptr,
+        ),
+        shape=(num_cells, num_cells),
+    )
+
+
+def find_landing_zones_sparse(person_coord_list, adj_matrix, height_map,
+                              edge_costs=None):
+    """Find the closest landing zone of every person with scipy.sparse.csgraph.dijkstra.
+
+    Several people are served by a single dijkstra call over the reversed
+    grid with every landing zone as a source, which gives each cell its
+    closest landing zone. A single person, and people standing on a landing
+    zone, which is never their own, get a search of their own bounded by
+    limit, which is doubled until a landing zone is found. It starts at
+    twice the planar distance to the closest landing zone, a lower bound of
+    the walking distance, and only the window of the map the limit can
+    reach is converted to a sparse matrix.
+
+    Parameters
+    ----------
+    person_coord_list : list of lists
+        (x, y) coordinates in the adj_matrix of the people supposed to receive supplies or deliveries.
+    adj_matrix : numpy.ndarray
+        Adjacent matrix where the meaning of each value is specified in the label_utils.py module.
+    height_map : numpy.ndarray
+        Depth estimation of the frame. Same shape as the adj_matrix.
+    edge_costs : numpy.ndarray
+        compute_edge_costs of the map. Computed if not given.
+
+    Returns
+    -------
+    list
+        (shortest_path, shortest_distance) tuple of each person, in the same order as person_coord_list.
+
+    """
+    if edge_costs is None:
+        edge_costs = compute_edge_costs(adj_matrix, height_map)
+    num_cols = adj_matrix.shape[1]
+    landing_zone_idxs = np.flatnonzero(can_uav_land(adj_matrix))
+    person_idxs = [int(i) * num_cols + int(j) for i, j in person_coord_list]
+    results = [([], -1) for _ in person_idxs]
+    if not len(landing_zone_idxs):
+        return results
+
+    is_landing_zone = np.zeros(adj_matrix.size, dtype=bool)
+    is_landing_zone[landing_zone_idxs] = True
+    if len(person_idxs) == 1:
+        bounded = [0]
+    else:
+        bounded = [k for k, person_idx in enumerate(person_idxs)
+                   if is_landing_zone[person_idx]]
+        distances, predecessors, _ = dijkstra(
+            edge_costs_to_csr(edge_costs, reverse=True),
+            directed=True,
+            indices=landing_zone_idxs,
+            return_predecessors=True,
+            min_only=True,
+        )
+        for k, person_idx in enumerate(person_idxs):
+            if is_landing_zone[person_idx] \
+                    or np.isinf(distances[person_idx]):
+                continue
+            # In the reversed grid the predecessors lead back to the
+            # landing zone, so the path comes in walking order.
+            shortest_path = []
+            idx = person_idx
+            while idx >= 0:
+                shortest_path.append(list(divmod(idx, num_cols)))
+                idx = int(predecessors[idx])
+            results[k] = (shortest_path, float(distances[person_idx]))
+    if bounded:
+        _bounded_searches(edge_costs, person_idxs, bounded,
+                          is_landing_zone.reshape(adj_matrix.shape[:2]),
+                          results)
+    return results
+
+
+def _bounded_searches(edge_costs, person_idxs, bounded, is_landing_zone,
+                      results):
+    """Search from each of the bounded people, doubling the limit until a landing zone is found. Fills results."""
+    num_rows, num_cols = edge_costs.shape[:2]
+    landing_zone_idxs = np.flatnonzero(is_landing_zone)
+    landing_zone_rows, landing_zone_cols = divmod(landing_zone_idxs,
+                                                  num_cols)
+    for k in bounded:
+        row, col = divmod(person_idxs[k], num_cols)
+        planar_distances = np.hypot(landing_zone_rows - row,
+                                    landing_zone_cols - col)
+        # The person's own position is never a landing zone.
+        planar_distances[landing_zone_idxs == person_idxs[k]] = np.inf
+        if np.isinf(planar_distances.min()):
+            continue
+        limit = 2 * float(planar_distances.min()) + 1
+        while True:
+            # Steps are never shorter than their planar length, so the
+            # cells closer than the limit fit in a window around the person.
+            radius = int(np.ceil(limit))
+            rows = slice(max(0, row - radius), min(num_rows, row + radius + 1))
+            cols = slice(max(0, col - radius), min(num_cols, col + radius + 1))
+            window_cols = cols.stop - cols.start
+            distances, predecessors = dijkstra(
+                edge_costs_to_csr(window_edge_costs(edge_costs, rows, cols)),
+                directed=True,
+                indices=(row - rows.start) * window_cols + col - cols.start,
+                return_predecessors=True,
+                limit=limit,
+            )
+            window_landing_zones = np.flatnonzero(
+                is_landing_zone[rows, cols]
+            )
+            # The person's own position is never a landing zone.
+            window_landing_zones = window_landing_zones[
+                window_landing_zones
+                != (row - rows.start) * window_cols + col - cols.start
+            ]
+            landing_zone_distances = distances[window_landing_zones]
+            if len(window_landing_zones) \
+                    and np.isfinite(landing_zone_distances.min()):
+                break
+            # Every cell closer than the limit was reached, so if the
+            # farthest one can't step past it, nothing else is reachable.
+            finite_costs = window_edge_costs[np.isfinite(window_edge_costs)]
+            max_edge_cost = float(finite_costs.max()) \
+                if finite_costs.size else 0.0
+            if distances[np.isfinite(distances)].max() + max_edge_cost \
+                    < limit:
+                break
+            limit *= 2
+        if not len(window_landing_zones) \
+                or np.isinf(landing_zone_distances.min()):
+            continue
+        idx = int(window_landing_zones[np.argmin(landing_zone_distances)])
+        shortest_distance = float(distances[idx])
+        shortest_path = []
+        # Predecessors of the sources are negative.
+        while idx >= 0:
+            window_row, window_col = divmod(idx, window_cols)
+            shortest_path.append([rows.start + window_row,
+                                  cols.start + window_col])
+            idx = int(predecessors[idx])
+        shortest_path.reverse()
+        results[k] = (shortest_path, shortest_distance)
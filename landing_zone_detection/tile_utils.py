@@ -0,0 +1,434 @@
+import heapq
+import os
+from collections import OrderedDict
+
+import numpy as np
+from landing_zone_detection.graph_utils import BASE_NEIGHBOURS, \
+    compute_edge_costs
+from landing_zone_detection.label_utils import can_uav_land
+
+
+class MapTile(object):
+    """Tile of a TiledMap loaded in memory.
+
+    Parameters
+    ----------
+    origin : tuple
+        Coordinate of the tile's first cell in the whole map.
+    adj_matrix : numpy.ndarray
+        Labels of the tile's cells.
+    edge_costs : numpy.ndarray
+        compute_edge_costs of the tile's cells. The halo makes the costs of the border cells the same as in the whole map.
+
+    """
+
+    def __init__(self, origin, adj_matrix, edge_costs):
+        self.origin = origin
+        self.adj_matrix = adj_matrix
+        self.edge_costs = edge_costs
+
+    @property
+    def nbytes(self):
+        """Memory used by the tile, in bytes."""
+        return self.adj_matrix.nbytes + self.edge_costs.nbytes
+
+
+class TiledMap(object):
+    """Map too big for the memory, stored in memory-mapped .npy files and loaded tile by tile.
+
+    The directory holds adj_matrix.npy, height_map.npy and optionally
+    frame.npy. Tiles are loaded on demand with a halo of neighbour cells, so
+    their edge costs match the ones of the whole map, and the least
+    recently used tiles are dropped to keep the working set under
+    max_resident_bytes. The working set also counts the memory reserved by
+    searches, i.e find_landing_zone_tiled.
+
+    Parameters
+    ----------
+    directory : str
+        Directory with the .npy files.
+    tile_size : int
+        Number of rows and columns of each tile.
+    halo : int
+        Number of cells loaded around each tile. Must be at least 1.
+    max_resident_bytes : int
+        Maximum memory used by the loaded tiles and the searches. A single tile bigger than that is still loaded, alone.
+    mode : str
+        np.load mmap_mode of the files, i.e 'r' or 'r+'.
+
+    Attributes
+    ----------
+    adj_matrix : numpy.memmap
+        Labels of the whole map.
+    height_map : numpy.memmap
+        Depth estimation of the whole map.
+    frame : numpy.memmap
+        Frame of the whole map, or None if there's no frame.npy.
+    resident_bytes : int
+        Memory used by the loaded tiles and reserved by the searches.
+    peak_resident_bytes : int
+        Highest resident_bytes so far.
+
+    """
+
+    def __init__(self, directory, tile_size=256, halo=1,
+                 max_resident_bytes=256 * 1024**2, mode='r'):
+        assert halo >= 1
+        self.directory = directory
+        self.tile_size = tile_size
+        self.halo = halo
+        self.max_resident_bytes = max_resident_bytes
+        self.adj_matrix = np.load(
+            os.path.join(directory, 'adj_matrix.npy'), mmap_mode=mode
+        )
+        self.height_map = np.load(
+            os.path.join(directory, 'height_map.npy'), mmap_mode=mode
+        )
+        frame_path = os.path.join(directory, 'frame.npy')
+        self.frame = np.load(frame_path, mmap_mode=mode) \
+            if os.path.exists(frame_path) else None
+        self.shape = self.adj_matrix.shape[:2]
+        self.resident_bytes = 0
+        self.peak_resident_bytes = 0
+        self._tiles = OrderedDict()
+
+    @classmethod
+    def create(cls, directory, shape, frame_shape=None,
+               adj_matrix_dtype=np.int8, height_map_dtype=np.float32,
+               frame_dtype=np.uint8, **kwargs):
+        """Create the empty memory-mapped files of a map and open it for writing.
+
+        Parameters
+        ----------
+        directory : str
+            Directory where the .npy files are created.
+        shape : tuple
+            Shape of the adj_matrix and height_map.
+        frame_shape : tuple
+            Shape of the frame, i.e (rows, cols, 3). No frame file is created if None.
+        adj_matrix_dtype : numpy.dtype
+            Data type of the labels.
+        height_map_dtype : numpy.dtype
+            Data type of the heights.
+        frame_dtype : numpy.dtype
+            Data type of the frame.
+        **kwargs : dict
+            Passed to TiledMap.
+
+        Returns
+        -------
+        TiledMap
+            Map opened with mode 'r+'.
+
+        """
+        os.makedirs(directory, exist_ok=True)
+        files = [('adj_matrix.npy', shape, adj_matrix_dtype),
+                 ('height_map.npy', shape, height_map_dtype)]
+        if frame_shape is not None:
+            files.append(('frame.npy', frame_shape, frame_dtype))
+        for filename, file_shape, dtype in files:
+            np.lib.format.open_memmap(
+                os.path.join(directory, filename),
+                mode='w+', shape=tuple(file_shape), dtype=dtype,
+            ).flush()
+        return cls(directory, mode='r+', **kwargs)
+
+    @classmethod
+    def from_arrays(cls, directory, adj_matrix, height_map, frame=None,
+                    **kwargs):
+        """Write in-memory arrays, i.e from an AerialImageData, to a tiled map.
+
+        Parameters
+        ----------
+        directory : str
+            Directory where the .npy files are created.
+        adj_matrix : numpy.ndarray
+            Adjacent matrix where the meaning of each value is specified in the label_utils.py module.
+        height_map : numpy.ndarray
+            Depth estimation of the frame. Same shape as the adj_matrix.
+        frame : numpy.ndarray
+            Optional frame.
+        **kwargs : dict
+            Passed to TiledMap.
+
+        Returns
+        -------
+        TiledMap
+            Map opened with mode 'r+'.
+
+        """
+        tiled_map = cls.create(
+            directory, shape=adj_matrix.shape,
+            frame_shape=None if frame is None else frame.shape,
+            height_map_dtype=height_map.dtype,
+            **kwargs
+        )
+        tiled_map.adj_matrix[:] = adj_matrix
+        tiled_map.height_map[:] = height_map
+        if frame is not None:
+            tiled_map.frame[:] = frame
+        tiled_map.flush()
+        return tiled_map
+
+    def flush(self):
+        """Write the changes to disk. Loaded tiles are dropped, since they may be outdated."""
+        for array in (self.adj_matrix, self.height_map, self.frame):
+            if isinstance(array, np.memmap):
+                array.flush()
+        self.resident_bytes -= sum(tile.nbytes
+                                   for tile in self._tiles.values())
+        self._tiles.clear()
+
+    def _make_room(self, nbytes):
+        """Drop the least recently used tiles until nbytes more fit, or no tile is left."""
+        while (self.resident_bytes + nbytes > self.max_resident_bytes
+               and self._tiles):
+            _, evicted_tile = self._tiles.popitem(last=False)
+            self.resident_bytes -= evicted_tile.nbytes
+
+    def reserve(self, nbytes):
+        """Count memory used along with the tiles, i.e by the state of a search, dropping tiles to make room.
+
+        Parameters
+        ----------
+        nbytes : int
+            Memory to reserve, in bytes.
+
+        Raises
+        ------
+        MemoryError
+            If nbytes don't fit in max_resident_bytes even without tiles.
+
+        """
+        self._make_room(nbytes)
+        if self.resident_bytes + nbytes > self.max_resident_bytes:
+            raise MemoryError(
+                'Cannot reserve {} bytes: {} of the {} max_resident_bytes '
+                'are already reserved'.format(nbytes, self.resident_bytes,
+                                              self.max_resident_bytes)
+            )
+        self.resident_bytes += nbytes
+        self.peak_resident_bytes = max(self.peak_resident_bytes,
+                                       self.resident_bytes)
+
+    def release(self, nbytes):
+        """Give back memory taken with reserve."""
+        self.resident_bytes -= nbytes
+
+    def tile(self, tile_i, tile_j):
+        """Return a tile, loading it if it's not resident.
+
+        Parameters
+        ----------
+        tile_i : int
+            Row of the tile.
+        tile_j : int
+            Column of the tile.
+
+        Returns
+        -------
+        MapTile
+            The tile.
+
+        """
+        key = (tile_i, tile_j)
+        if key in self._tiles:
+            self._tiles.move_to_end(key)
+            return self._tiles[key]
+        num_rows, num_cols = self.shape
+        row_start = tile_i * self.tile_size
+        row_stop = min(row_start + self.tile_size, num_rows)
+        col_start = tile_j * self.tile_size
+        col_stop = min(col_start + self.tile_size, num_cols)
+        halo_row_start = max(0, row_start - self.halo)
+        halo_col_start = max(0, col_start - self.halo)
+        window = (
+            slice(halo_row_start, min(num_rows, row_stop + self.halo)),
+            slice(halo_col_start, min(num_cols, col_stop + self.halo)),
+        )
+        core = (
+            slice(row_start - halo_row_start, row_stop - halo_row_start),
+            slice(col_start - halo_col_start, col_stop - halo_col_start),
+        )
+        adj_matrix = np.asarray(self.adj_matrix[window])
+        edge_costs = compute_edge_costs(
+            adj_matrix, np.asarray(self.height_map[window])
+        )
+        tile = MapTile(
+            origin=(row_start, col_start),
+            adj_matrix=np.ascontiguousarray(adj_matrix[core]),
+            edge_costs=np.ascontiguousarray(edge_costs[core]),
+        )
+        # Make room before adding the tile, so the peak respects the limit.
+        self._make_room(tile.nbytes)
+        self._tiles[key] = tile
+        self.resident_bytes += tile.nbytes
+        self.peak_resident_bytes = max(self.peak_resident_bytes,
+                                       self.resident_bytes)
+        return tile
+
+
+class TiledSearchState(object):
+    """Distances and predecessors of a search over a TiledMap, allocated tile by tile.
+
+    Only the tiles the search reaches get arrays, and their memory is
+    reserved in the TiledMap, so it counts in its max_resident_bytes and
+    peak_resident_bytes. Each cell takes 9 bytes: a float64 distance and
+    the int8 direction, in BASE_NEIGHBOURS, of the step that reached it.
+
+    Parameters
+    ----------
+    tiled_map : TiledMap
+        Map being searched.
+
+    """
+
+    def __init__(self, tiled_map):
+        self.tiled_map = tiled_map
+        self.nbytes = 0
+        self._tiles = {}
+
+    def tile(self, tile_i, tile_j):
+        """State of a tile, allocated on first use.
+
+        Parameters
+        ----------
+        tile_i : int
+            Row of the tile.
+        tile_j : int
+            Column of the tile.
+
+        Returns
+        -------
+        (memoryview, memoryview)
+            Distances and directions of the tile_size x tile_size cells, flattened in row-major order. Unreached cells are inf and -1. Memoryviews are faster than numpy arrays to index one cell at a time.
+
+        """
+        key = (tile_i, tile_j)
+        if key not in self._tiles:
+            num_cells = self.tiled_map.tile_size ** 2
+            nbytes = num_cells * (np.dtype(np.float64).itemsize
+                                  + np.dtype(np.int8).itemsize)
+            self.tiled_map.reserve(nbytes)
+            self.nbytes += nbytes
+            self._tiles[key] = (
+                memoryview(np.full(num_cells, np.inf)),
+                memoryview(np.full(num_cells, -1, dtype=np.int8)),
+            )
+        return self._tiles[key]
+
+    def release(self):
+        """Free the arrays and give their memory back to the TiledMap."""
+        self._tiles.clear()
+        self.tiled_map.release(self.nbytes)
+        self.nbytes = 0
+
+
+def find_landing_zone_tiled(person_coord, tiled_map, stats=None):
+    """Same as find_landing_zone, but over a TiledMap.
+
+    The search state is kept in a TiledSearchState, so only the tiles the
+    search actually reaches use memory, within the max_resident_bytes of
+    the map, and tiles are paged in as the frontier reaches them.
+
+    Parameters
+    ----------
+    person_coord : list
+        (x, y) coordinate in the adj_matrix of the person supposed to receive supplies or deliveries.
+    tiled_map : TiledMap
+        Map where the landing zone is searched.
+    stats : SearchStats
+        Optional counters to fill, i.e the number of nodes expanded.
+
+    Returns
+    -------
+    (list, int)
+        Returns the shortest_path and the shortest_distance as a tuple.
+
+    Raises
+    ------
+    MemoryError
+        If the search state doesn't fit in the max_resident_bytes of the map.
+
+    """
+    num_cols = tiled_map.shape[1]
+    tile_size = tiled_map.tile_size
+    # Offset of each step in the whole map and in the state of a tile.
+    neighbour_offsets = [(di, dj, di * num_cols + dj, di * tile_size + dj)
+                         for di, dj in BASE_NEIGHBOURS]
+    inf = float('inf')
+    person_i, person_j = int(person_coord[0]), int(person_coord[1])
+    person_idx = person_i * num_cols + person_j
+    state = TiledSearchState(tiled_map)
+    heap = [(0.0, person_idx)]
+    nodes_expanded = 0
+    landing_zone_idx = -1
+
+    try:
+        distances, _ = state.tile(person_i // tile_size,
+                                  person_j // tile_size)
+        distances[person_i % tile_size * tile_size
+                  + person_j % tile_size] = 0.0
+        while heap:
+            curr_distance, curr_idx = heapq.heappop(heap)
+            i, j = divmod(curr_idx, num_cols)
+            tile_key = (i // tile_size, j // tile_size)
+            distances, directions = state.tile(*tile_key)
+            state_i, state_j = i % tile_size, j % tile_size
+            state_idx = state_i * tile_size + state_j
+            # Skip stale entries, the cell was already reached with less
+            # cost.
+            if curr_distance > distances[state_idx]:
+                continue
+            nodes_expanded += 1
+            tile = tiled_map.tile(*tile_key)
+            tile_i, tile_j = i - tile.origin[0], j - tile.origin[1]
+            # The person's own position is never a landing zone.
+            if curr_idx != person_idx \
+                    and can_uav_land(tile.adj_matrix[tile_i, tile_j]):
+                landing_zone_idx = curr_idx
+                break
+            for k, ((di, dj, offset, state_offset), cost) in enumerate(zip(
+                    neighbour_offsets,
+                    tile.edge_costs[tile_i, tile_j].tolist())):
+                # Ignore coords that do not exist or that are unreachable.
+                if cost == inf:
+                    continue
+                if 0 <= state_i + di < tile_size \
+                        and 0 <= state_j + dj < tile_size:
+                    nb_distances, nb_directions = distances, directions
+                    nb_state_idx = state_idx + state_offset
+                else:
+                    # The neighbour is in another tile.
+                    nb_i, nb_j = i + di, j + dj
+                    nb_distances, nb_directions = state.tile(
+                        nb_i // tile_size, nb_j // tile_size
+                    )
+                    nb_state_idx = nb_i % tile_size * tile_size \
+                        + nb_j % tile_size
+                nb_distance = curr_distance + cost
+                if nb_distance < nb_distances[nb_state_idx]:
+                    nb_distances[nb_state_idx] = nb_distance
+                    nb_directions[nb_state_idx] = k
+                    heapq.heappush(heap, (nb_distance, curr_idx + offset))
+
+        if stats is not None:
+            stats.nodes_expanded += nodes_expanded
+        if landing_zone_idx == -1:
+            return [], -1
+        i, j = divmod(landing_zone_idx, num_cols)
+        distances, _ = state.tile(i // tile_size, j // tile_size)
+        shortest_distance = distances[i % tile_size * tile_size
+                                      + j % tile_size]
+        shortest_path = []
+        k = 0
+        while k != -1:
+            shortest_path.append([i, j])
+            _, directions = state.tile(i // tile_size, j // tile_size)
+            k = directions[i % tile_size * tile_size + j % tile_size]
+            if k != -1:
+                i, j = i - BASE_NEIGHBOURS[k][0], j - BASE_NEIGHBOURS[k][1]
+        shortest_path.reverse()
+        return shortest_path, shortest_distance
+    finally:
+        state.release()
@@ -29,15 +29,74 @@ def item_from_color(color, col_size=32, row_size=32):
     )
 
 
+def color_lut(value_to_color, num_channels=3, img_dtype=np.uint8):
+    """Colour lookup table of integer labels.
+
+    Parameters
+    ----------
+    value_to_color : dict
+        Dict to map each value to a color.
+    num_channels : int
+        Number of channels of each color.
+    img_dtype : int
+        Data type of the colors.
+
+    Returns
+    -------
+    (numpy.ndarray, numpy.ndarray, int)
+        (n, num_channels) colors, (n,) mask of the defined rows, and the value of the first row.
+
+    """
+    values = [int(value) for value in value_to_color]
+    min_value = min(values)
+    lut = np.zeros((max(values) - min_value + 1, num_channels),
+                   dtype=img_dtype)
+    defined = np.zeros(len(lut), dtype=bool)
+    for value, color in value_to_color.items():
+        lut[int(value) - min_value] = color
+        defined[int(value) - min_value] = True
+    return lut, defined, min_value
+
+
+def grid_items(img, num_cols, num_rows, col_size, row_size):
+    """View of an image as a grid of items.
+
+    Parameters
+    ----------
+    img : numpy.ndarray
+        C-contiguous image of shape (num_cols*col_size, num_rows*row_size, channels).
+    num_cols : int
+        Number of columns in the adj_matrix (or height_map).
+    num_rows : int
+        Number of rows in the adj_matrix (or height_map).
+    col_size : int
+        Width of each adj_matrix (or height_map) item.
+    row_size : int
+        Height of each adj_matrix (or height_map) item.
+
+    Returns
+    -------
+    numpy.ndarray
+        (num_cols, col_size, num_rows, row_size, channels) view. Writing it writes the image.
+
+    """
+    assert img.flags.c_contiguous
+    return img.reshape(num_cols, col_size, num_rows, row_size, -1)
+
+
 def adj_matrix_to_image(adj_matrix,
                         value_to_color={1: [80, 30, 50],
                                         0: [168, 50, 125],
                                         -1: [0, 0, 255]},
                         num_channels=3,
-                        num_cols=7, num_rows=7,
+                        num_cols=None, num_rows=None,
                         col_size=32, row_size=32,
-                        img_dtype=np.uint8):
-    """Convert a node list to an image. Do that by coloring the image items at the coordinates in the node_list.
+                        img_dtype=np.uint8,
+                        out=None):
+    """Convert an adj_matrix to an image, coloring each item by its value.
+
+    The values index a colour lookup table, and each color is broadcast
+    over its item straight into the output image.
 
     Parameters
     ----------
@@ -46,15 +105,17 @@ def adj_matrix_to_image(adj_matrix,
     value_to_color : dict
         Dict to map each value in the adj_matrix to a differenct color.
     num_cols : int
-        Number of columns in each adj_matrix (or height_map) item.
+        Number of columns in the adj_matrix (or height_map). Defaults to adj_matrix.shape[0].
     num_rows : int
-        Number of rows in each adj_matrix (or height_map) item.
+        Number of rows in the adj_matrix (or height_map). Defaults to adj_matrix.shape[1].
     col_size : int
         Width of each adj_matrix (or height_map) item.
     row_size : int
         Height of each adj_matrix (or height_map) item.
     img_dtype : int
         Data type of the resulting image.
+    out : numpy.ndarray
+        Optional C-contiguous image of shape (num_cols*col_size, num_rows*row_size, num_channels) to draw into.
 
     Returns
     -------
@@ -62,23 +123,36 @@ def adj_matrix_to_image(adj_matrix,
         2D matrix representing an image.
 
     """
-    img = np.zeros(
-        (num_cols*col_size, num_rows*row_size, num_channels),
-        dtype=img_dtype
-    )
-    value_to_item = {
-        1: item_from_color(value_to_color[1]),
-        0: item_from_color(value_to_color[0]),
-        -1: item_from_color(value_to_color[-1]),
-    }
-    for i, col in enumerate(adj_matrix):
-        x1 = col_size*i
-        x2 = col_size*(i+1)
-        for j, value in enumerate(col):
-            y1 = row_size*j
-            y2 = row_size*(j+1)
-            img[x1:x2, y1:y2, :] = value_to_item[value].copy()
-    return img
+    adj_matrix = np.asarray(adj_matrix)
+    if num_cols is None:
+        num_cols = adj_matrix.shape[0]
+    if num_rows is None:
+        num_rows = adj_matrix.shape[1]
+    if out is None:
+        out = np.zeros(
+            (num_cols*col_size, num_rows*row_size, num_channels),
+            dtype=img_dtype
+        )
+    lut, defined, min_value = color_lut(value_to_color, num_channels,
+                                        out.dtype)
+    adj_matrix = adj_matrix[:num_cols, :num_rows]
+    idxs = adj_matrix.astype(np.intp) - min_value
+    in_range = not idxs.size \
+        or (idxs.min() >= 0 and idxs.max() < len(lut))
+    if not in_range or not (defined.all() or defined[idxs].all()):
+        clipped_idxs = np.clip(idxs, 0, len(lut) - 1)
+        raise KeyError(adj_matrix[(clipped_idxs != idxs)
+                                  | ~defined[clipped_idxs]][0])
+    colors = np.take(lut, idxs, axis=0)
+    if idxs.shape == (num_cols, num_rows):
+        # Nearest neighbour upscaling repeats each color over its item.
+        cv2.resize(colors, (num_rows*row_size, num_cols*col_size), dst=out,
+                   interpolation=cv2.INTER_NEAREST)
+    else:
+        items = grid_items(out, num_cols, num_rows, col_size, row_size)
+        items[:idxs.shape[0], :, :idxs.shape[1]] = \
+            colors[:, None, :, None, :]
+    return out
 
 
 def node_list_to_image(node_list,
@@ -86,7 +160,8 @@ def node_list_to_image(node_list,
                        num_channels=3,
                        num_cols=7, num_rows=7,
                        col_size=32, row_size=32,
-                       img_dtype=np.uint8):
+                       img_dtype=np.uint8,
+                       out=None):
     """Convert a node list to an image. Do that by coloring the image items at the coordinates in the node_list.
 
     Parameters
@@ -96,15 +171,17 @@ def node_list_to_image(node_list,
     item_color : list
         Color of each node/item.
     num_cols : int
-        Number of columns in each adj_matrix (or height_map) item.
+        Number of columns in the adj_matrix (or height_map), i.e adj_matrix.shape[0].
     num_rows : int
-        Number of rows in each adj_matrix (or height_map) item.
+        Number of rows in the adj_matrix (or height_map), i.e adj_matrix.shape[1].
     col_size : int
         Width of each adj_matrix (or height_map) item.
     row_size : int
         Height of each adj_matrix (or height_map) item.
     img_dtype : int
         Data type of the resulting image.
+    out : numpy.ndarray
+        Optional C-contiguous image of shape (num_cols*col_size, num_rows*row_size, num_channels) to draw into. Items outside the nodes are left as they are.
 
     Returns
     -------
@@ -112,18 +189,16 @@ def node_list_to_image(node_list,
         2D matrix representing an image.
 
     """
-    img = np.zeros(
-        (num_cols*col_size, num_rows*row_size, num_channels),
-        dtype=img_dtype
-    )
-    item = item_from_color(item_color)
-    for node in node_list:
-        x1 = col_size*node[0]
-        x2 = col_size*(node[0]+1)
-        y1 = row_size*node[1]
-        y2 = row_size*(node[1]+1)
-        img[x1:x2, y1:y2, :] = item.copy()
-    return img
+    nodes = np.asarray(node_list, dtype=np.intp).reshape(-1, 2)
+    if out is None:
+        out = np.zeros(
+            (num_cols*col_size, num_rows*row_size, num_channels),
+            dtype=img_dtype
+        )
+    items = grid_items(out, num_cols, num_rows, col_size, row_size)
+    items[nodes[:, 0], :, nodes[:, 1]] = \
+        np.asarray(item_color, dtype=out.dtype)
+    return out
 
 
 def plot_frame(frame, width=224, height=224, images_to_overlay=[]):
@@ -143,7 +218,7 @@ def plot_frame(frame, width=224, height=224, images_to_overlay=[]):
     """
     # overlay images on the frame
     if images_to_overlay:
-        img_to_overlay = images_to_overlay[0]
+        img_to_overlay = images_to_overlay[0].copy()
     for img in images_to_overlay[1:]:
         img_to_overlay += img
     if images_to_overlay:
@@ -0,0 +1,174 @@
+import json
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from mock_data.data import AerialImageData, RandomAerialImageDataGenerator
+
+MANIFEST_FILENAME = 'corpus.json'
+# Fixed timestamp of the .npy entries, so equal shards are equal bytes.
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+def shard_filename(shard_idx):
+    """Name of the file of a shard inside the corpus directory."""
+    return 'shard_{:06d}.npz'.format(shard_idx)
+
+
+def write_npz(path, arrays):
+    """Deterministic np.savez: uncompressed .npy entries with a fixed timestamp, written atomically.
+
+    Parameters
+    ----------
+    path : str
+        Path of the .npz file.
+    arrays : dict
+        numpy.ndarray of each entry, by name. Entries are written in sorted order.
+
+    """
+    tmp_path = path + '.tmp'
+    with zipfile.ZipFile(tmp_path, mode='w',
+                         compression=zipfile.ZIP_STORED) as zip_file:
+        for name in sorted(arrays):
+            info = zipfile.ZipInfo(name + '.npy', date_time=ZIP_DATE_TIME)
+            with zip_file.open(info, mode='w', force_zip64=True) as file:
+                np.lib.format.write_array(file, np.asarray(arrays[name]),
+                                          allow_pickle=False)
+    os.replace(tmp_path, path)
+
+
+def _generate_shard(directory, shard_idx, seed_sequence, num_scenarios,
+                    people_quantity, include_frame, generator_kwargs):
+    """Generate the scenarios of a shard and write them. Runs in a worker process."""
+    generator = RandomAerialImageDataGenerator(**generator_kwargs)
+    rng = np.random.default_rng(seed_sequence)
+    adj_matrices, height_maps, frames = [], [], []
+    person_coords, helipad_coords = [], []
+    for _ in range(num_scenarios):
+        data = generator.generate(people_quantity=people_quantity, rng=rng)
+        adj_matrices.append(data.adj_matrix.astype(np.int8))
+        height_maps.append(data.height_map)
+        person_coords.append(data.person_coord_list)
+        helipad_coords.append(data.helipad_coord)
+        if include_frame:
+            frames.append(data.frame)
+    arrays = {
+        'adj_matrix': np.stack(adj_matrices),
+        'height_map': np.stack(height_maps),
+        'person_coord_list': np.asarray(
+            person_coords, dtype=np.int32
+        ).reshape(num_scenarios, people_quantity, 2),
+        'helipad_coord': np.asarray(helipad_coords, dtype=np.int32),
+    }
+    if include_frame:
+        arrays['frame'] = np.stack(frames)
+    path = os.path.join(directory, shard_filename(shard_idx))
+    write_npz(path, arrays)
+    return path
+
+
+def generate_corpus(directory, n_scenarios, grid_size, people_quantity, seed,
+                    shard_size=1000, item_size=1, include_frame=False,
+                    max_workers=None, **kwargs):
+    """Generate a reproducible corpus of random scenarios in sharded .npz files.
+
+    Each shard gets its own np.random.Generator, spawned from a SeedSequence
+    of the seed, so the files are byte-identical whatever the number of
+    workers. Shards are generated in a process pool and written as soon as
+    they're done, so memory only holds a shard per worker.
+
+    Parameters
+    ----------
+    directory : str
+        Directory where the shards and the corpus.json manifest are written.
+    n_scenarios : int
+        Number of scenarios.
+    grid_size : tuple
+        (num_cols, num_rows) items of the adj_matrix of each scenario, like RandomAerialImageDataGenerator.
+    people_quantity : int
+        How many people to place in each scenario.
+    seed : int
+        Seed of the corpus.
+    shard_size : int
+        Number of scenarios per shard.
+    item_size : int
+        col_size and row_size of each item of the frame.
+    include_frame : bool
+        Whether to keep the frames. They're (grid_size * item_size) images, by far the largest part.
+    max_workers : int
+        Number of worker processes. Defaults to the number of CPUs.
+    **kwargs : dict
+        Passed to RandomAerialImageDataGenerator, i.e the options images.
+
+    Returns
+    -------
+    list
+        Paths of the shards, in order.
+
+    """
+    os.makedirs(directory, exist_ok=True)
+    num_shards = -(-n_scenarios // shard_size)
+    seed_sequences = np.random.SeedSequence(seed).spawn(num_shards)
+    generator_kwargs = dict(
+        kwargs,
+        width=grid_size[0] * item_size,
+        height=grid_size[1] * item_size,
+        col_size=item_size,
+        row_size=item_size,
+    )
+    # Load the atlases before the pool starts, so forked workers share them.
+    RandomAerialImageDataGenerator(**generator_kwargs)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        paths = list(executor.map(
+            _generate_shard,
+            [directory] * num_shards,
+            range(num_shards),
+            seed_sequences,
+            [min(shard_size, n_scenarios - shard_idx * shard_size)
+             for shard_idx in range(num_shards)],
+            [people_quantity] * num_shards,
+            [include_frame] * num_shards,
+            [generator_kwargs] * num_shards,
+        ))
+    with open(os.path.join(directory, MANIFEST_FILENAME), 'w') as file:
+        json.dump({
+            'n_scenarios': n_scenarios,
+            'grid_size': list(grid_size),
+            'people_quantity': people_quantity,
+            'seed': seed,
+            'shard_size': shard_size,
+            'item_size': item_size,
+            'include_frame': include_frame,
+            'shards': [os.path.basename(path) for path in paths],
+        }, file, indent=2, sort_keys=True)
+    return paths
+
+
+def iter_corpus(directory):
+    """Read the scenarios of a corpus back, one shard in memory at a time.
+
+    Parameters
+    ----------
+    directory : str
+        Directory given to generate_corpus.
+
+    Yields
+    ------
+    AerialImageData
+        Each scenario, in order. frame is None if the corpus has no frames.
+
+    """
+    with open(os.path.join(directory, MANIFEST_FILENAME)) as file:
+        manifest = json.load(file)
+    for filename in manifest['shards']:
+        with np.load(os.path.join(directory, filename)) as shard:
+            arrays = {name: shard[name] for name in shard.files}
+        for k in range(len(arrays['adj_matrix'])):
+            yield AerialImageData(
+                frame=arrays['frame'][k] if 'frame' in arrays else None,
+                adj_matrix=arrays['adj_matrix'][k],
+                height_map=arrays['height_map'][k],
+                person_coord_list=arrays['person_coord_list'][k].tolist(),
+                helipad_coord=arrays['helipad_coord'][k].tolist(),
+            )
@@ -103,6 +103,88 @@ HELIPAD_OPTIONS_HEIGHTS = [
 ]
 
 
+# Tiles read and resized so far, by (path, col_size, row_size, interpolation),
+# and their stacked atlases. Entries are read-only, so generators share
+# them, and so do worker processes forked after they were loaded.
+_IMG_ITEM_CACHE = {}
+_ATLAS_CACHE = {}
+
+
+def load_img_item(path, col_size, row_size, interpolation=cv2.INTER_LINEAR):
+    """Read and resize an image item, once per process.
+
+    Parameters
+    ----------
+    path : str
+        File path.
+    col_size : int
+        Width of the resized item.
+    row_size : int
+        Height of the resized item.
+    interpolation : int
+        Type of the resize method i.e cv2.INTER_LINEAR.
+
+    Returns
+    -------
+    numpy.ndarray
+        Read-only resized image, shared by every caller.
+
+    """
+    key = (path, col_size, row_size, interpolation)
+    img_item = _IMG_ITEM_CACHE.get(key)
+    if img_item is None:
+        img = cv2.imread(path)
+        if img is None:
+            raise IOError('Cannot read the image item {}'.format(path))
+        img_item = cv2.resize(src=img, dsize=(col_size, row_size),
+                              interpolation=interpolation)
+        img_item.flags.writeable = False
+        _IMG_ITEM_CACHE[key] = img_item
+    return img_item
+
+
+def load_atlas(paths, col_size, row_size, interpolation=cv2.INTER_LINEAR,
+               dtype=np.uint8):
+    """Stack the image items of a list of options, once per process.
+
+    Parameters
+    ----------
+    paths : list
+        File path of each option.
+    col_size : int
+        Width of each item.
+    row_size : int
+        Height of each item.
+    interpolation : int
+        Type of the resize method i.e cv2.INTER_LINEAR.
+    dtype : np.uint8
+        Data type of the atlas.
+
+    Returns
+    -------
+    numpy.ndarray
+        Read-only (n_options, row_size, col_size, channels) atlas, shared by every caller.
+
+    """
+    key = (tuple(paths), col_size, row_size, interpolation,
+           np.dtype(dtype).str)
+    atlas = _ATLAS_CACHE.get(key)
+    if atlas is None:
+        atlas = np.stack([
+            load_img_item(path, col_size, row_size, interpolation)
+            for path in paths
+        ]).astype(dtype, copy=False)
+        atlas.flags.writeable = False
+        _ATLAS_CACHE[key] = atlas
+    return atlas
+
+
+def clear_atlas_cache():
+    """Drop the image items and atlases loaded so far."""
+    _IMG_ITEM_CACHE.clear()
+    _ATLAS_CACHE.clear()
+
+
 class RandomAerialImageDataGenerator(object):
     """Class to generate random AerialImageData object using the given terrain and person options.
 
@@ -138,6 +220,8 @@ class RandomAerialImageDataGenerator(object):
         Labels of each helipad_options in helipad_options_images.
     helipad_options_heights : list
         Estimated depth (height from the drone to the ground) of each option in helipad_options_images.
+    interpolation : int
+        Type of the resize method of the image items i.e cv2.INTER_LINEAR.
 
     Attributes
     ----------
@@ -158,7 +242,8 @@ class RandomAerialImageDataGenerator(object):
                  person_options_heights=PERSON_OPTIONS_HEIGHTS,
                  helipad_options_images=HELIPAD_OPTIONS_IMAGES,
                  helipad_options_labels=HELIPAD_OPTIONS_LABELS,
-                 helipad_options_heights=HELIPAD_OPTIONS_HEIGHTS):
+                 helipad_options_heights=HELIPAD_OPTIONS_HEIGHTS,
+                 interpolation=cv2.INTER_LINEAR):
         self.width = width
         self.height = height
         self.channels = channels
@@ -174,43 +259,40 @@ class RandomAerialImageDataGenerator(object):
         self.helipad_options_images = helipad_options_images
         self.helipad_options_labels = helipad_options_labels
         self.helipad_options_heights = helipad_options_heights
+        self.interpolation = interpolation
 
         self.num_cols = self.width // self.col_size
         self.num_rows = self.height // self.row_size
 
-        self.terrain_options_images = self.load_img_items(
+        # Stacked (n_options, row, col, channels) tiles and their labels and
+        # heights, so generate picks every item at once by fancy indexing.
+        # The option lists are left untouched and the atlases are shared.
+        self.terrain_options_atlas = self.load_atlas(
             self.terrain_options_images
         )
-        self.person_options_images = self.load_img_items(
+        self.person_options_atlas = self.load_atlas(
             self.person_options_images
         )
-        self.helipad_options_images = self.load_img_items(
+        self.helipad_options_atlas = self.load_atlas(
             self.helipad_options_images
         )
-
-    def __read_img_item(self, filename, **kwargs):
-        """Read an image item from filename.
-
-        Parameters
-        ----------
-        filename : str
-            File path.
-        **kwargs : dict
-            **kwargs.
-
-        Returns
-        -------
-        numpy.ndarray
-            2D matrix representing an image.
-
-        """
-        return cv2.imread(
-            filename,
-            **kwargs
+        self.terrain_options_images = list(self.terrain_options_atlas)
+        self.person_options_images = list(self.person_options_atlas)
+        self.helipad_options_images = list(self.helipad_options_atlas)
+        self.terrain_options_label_array = np.asarray(
+            self.terrain_options_labels, dtype=np.float32
+        )
+        self.terrain_options_height_array = np.asarray(
+            self.terrain_options_heights, dtype=np.float32
+        )
+        self.person_options_label_array = np.asarray(
+            self.person_options_labels, dtype=np.float32
+        )
+        self.person_options_height_array = np.asarray(
+            self.person_options_heights, dtype=np.float32
         )
 
-    def __resize_img_item(self, img_item,
-                          resize_method=cv2.INTER_LINEAR, **kwargs):
+    def __resize_img_item(self, img_item, resize_method=None, **kwargs):
         """Resize an image item.
 
         Parameters
@@ -218,7 +300,7 @@ class RandomAerialImageDataGenerator(object):
         img_item : numpy.ndarray
             2D matrix representing an image.
         resize_method : int
-            Type of the resize method i.e cv2.INTER_LINEAR.
+            Type of the resize method i.e cv2.INTER_LINEAR. Defaults to the interpolation of the generator.
         **kwargs : dict
             **kwargs
 
@@ -231,13 +313,17 @@ class RandomAerialImageDataGenerator(object):
         return cv2.resize(
             src=img_item,
             dsize=(self.col_size, self.row_size),
-            interpolation=resize_method,
+            interpolation=self.interpolation if resize_method is None
+            else resize_method,
             **kwargs
         )
 
     def load_img_items(self, img_items):
         """Read and transform a list of image items.
 
+        Paths are loaded through the shared cache of load_img_item. The
+        list itself is not modified.
+
         Parameters
         ----------
         img_items : list
@@ -246,50 +332,81 @@ class RandomAerialImageDataGenerator(object):
         Returns
         -------
         list
-            List of the transformed images.
+            New list of the transformed images.
+
+        """
+        return [
+            load_img_item(img, self.col_size, self.row_size,
+                          self.interpolation)
+            if isinstance(img, str) else self.__resize_img_item(img)
+            for img in img_items
+        ]
+
+    def load_atlas(self, img_items):
+        """Stack the transformed image items of a list of options.
+
+        Parameters
+        ----------
+        img_items : list
+            List of paths, or list of numpy.ndarrays.
+
+        Returns
+        -------
+        numpy.ndarray
+            (n_options, row_size, col_size, channels) atlas with the dtype of the frame. Shared and read-only if img_items are paths.
 
         """
-        for i, img in enumerate(img_items):
-            # read images
-            if type(img) == str:
-                img = self.__read_img_item(img)
-            # transform images
-            img = self.__resize_img_item(img)
-            img_items[i] = img
-        return img_items
+        if all(isinstance(img, str) for img in img_items):
+            return load_atlas(img_items, self.col_size, self.row_size,
+                              self.interpolation, self.dtype)
+        return np.stack(self.load_img_items(img_items)).astype(self.dtype)
+
+    def frame_items(self, frame):
+        """View of a frame as a grid of items.
+
+        Parameters
+        ----------
+        frame : numpy.ndarray
+            C-contiguous frame of shape (num_cols*col_size, num_rows*row_size, channels).
+
+        Returns
+        -------
+        numpy.ndarray
+            (num_cols, num_rows, col_size, row_size, channels) view. Writing an item writes the frame.
+
+        """
+        assert frame.flags.c_contiguous
+        return frame.reshape(
+            self.num_cols, self.col_size, self.num_rows, self.row_size, -1
+        ).transpose(0, 2, 1, 3, 4)
 
     def place_people_on_frame(self, frame, adj_matrix, height_map,
-                              people_quantity):
+                              people_quantity, rng=None):
         assert people_quantity <= (self.num_cols * self.num_rows)/2
-        unique_random_coords = []
-        while len(unique_random_coords) < people_quantity:
-            coord = [
-                np.random.choice(self.num_cols),
-                np.random.choice(self.num_rows)
-            ]
-            if coord not in unique_random_coords:
-                unique_random_coords.append(coord)
-        for (i, j) in unique_random_coords:
-            x1 = self.col_size*i
-            x2 = self.col_size*(i+1)
-            y1 = self.row_size*j
-            y2 = self.row_size*(j+1)
-            chosen_item_idx = np.random.choice(len(self.person_options_images))
-            height_map[i][j] = self.person_options_heights[chosen_item_idx]
-            adj_matrix[i][j] = self.person_options_labels[chosen_item_idx]
-            frame[x1:x2, y1:y2, :] = self.person_options_images[
-                chosen_item_idx
-            ]
+        rng = np.random if rng is None else rng
+        # Distinct cells are drawn at once, without replacement.
+        flat_idxs = rng.choice(self.num_cols * self.num_rows,
+                               size=people_quantity, replace=False)
+        i, j = np.divmod(flat_idxs, self.num_rows)
+        chosen_item_idxs = rng.choice(len(self.person_options_images),
+                                      size=people_quantity)
+        height_map[i, j] = self.person_options_height_array[chosen_item_idxs]
+        adj_matrix[i, j] = self.person_options_label_array[chosen_item_idxs]
+        self.frame_items(frame)[i, j] = \
+            self.person_options_atlas[chosen_item_idxs]
+        unique_random_coords = np.stack([i, j], axis=1).tolist()
         return frame, adj_matrix, height_map, unique_random_coords
 
-    def place_helipad_on_frame(self, frame, adj_matrix, height_map):
-        i = np.random.choice(self.num_cols)
+    def place_helipad_on_frame(self, frame, adj_matrix, height_map,
+                               rng=None):
+        rng = np.random if rng is None else rng
+        i = rng.choice(self.num_cols)
         x1 = self.col_size*i
         x2 = self.col_size*(i+1)
-        j = np.random.choice(self.num_rows)
+        j = rng.choice(self.num_rows)
         y1 = self.row_size*j
         y2 = self.row_size*(j+1)
-        chosen_item_idx = np.random.choice(len(self.helipad_options_images))
+        chosen_item_idx = rng.choice(len(self.helipad_options_images))
         height_map[i][j] = self.helipad_options_heights[chosen_item_idx]
         adj_matrix[i][j] = self.helipad_options_labels[chosen_item_idx]
         frame[x1:x2, y1:y2, :] = self.helipad_options_images[
@@ -297,7 +414,7 @@ class RandomAerialImageDataGenerator(object):
         ]
         return frame, adj_matrix, height_map, [i, j]
 
-    def generate(self, people_quantity, place_helipad=True):
+    def generate(self, people_quantity, place_helipad=True, rng=None):
         """Generates a random AerialImageData object using the given terrain and person options.
 
         Parameter
@@ -306,6 +423,8 @@ class RandomAerialImageDataGenerator(object):
             How many people to place in the frame or map.
         place_helipad : bool
             Wether to place a helipad at a random location.
+        rng : numpy.random.Generator
+            Source of the random choices. Defaults to the global np.random state.
 
         Returns
         ----------
@@ -319,6 +438,12 @@ class RandomAerialImageDataGenerator(object):
             (x, y) coordinates in the adj_matrix of the people supposed to receive supplies or deliveries.
 
         """
+        # populate with the terrain options, all drawn at once
+        rng = np.random if rng is None else rng
+        chosen_item_idxs = rng.choice(
+            len(self.terrain_options_images),
+            size=(self.num_cols, self.num_rows)
+        )
         data = AerialImageData(
             frame=np.empty(
                 (
@@ -328,40 +453,20 @@ class RandomAerialImageDataGenerator(object):
                 ),
                 dtype=self.dtype,
             ),
-            adj_matrix=np.empty(
-                (self.num_cols, self.num_rows),
-                dtype=np.float32,
-            ),
-            height_map=np.empty(
-                (self.num_cols, self.num_rows),
-                dtype=np.float32,
-            ),
-
+            adj_matrix=self.terrain_options_label_array[chosen_item_idxs],
+            height_map=self.terrain_options_height_array[chosen_item_idxs],
         )
-        # populate with the terrain options
-        for i in range(self.num_cols):
-            x1 = self.col_size*i
-            x2 = self.col_size*(i+1)
-            for j in range(self.num_rows):
-                y1 = self.row_size*j
-                y2 = self.row_size*(j+1)
-                chosen_item_idx = np.random.choice(
-                    len(self.terrain_options_images)
-                )
-                data.height_map[i][j] = self.terrain_options_heights[
-                    chosen_item_idx
-                ]
-                data.adj_matrix[i][j] = \
-                    self.terrain_options_labels[chosen_item_idx]
-                data.frame[x1:x2, y1:y2, :] = \
-                    self.terrain_options_images[chosen_item_idx]
+        # Gather the tiles straight into the frame, through the item view.
+        np.take(self.terrain_options_atlas, chosen_item_idxs, axis=0,
+                out=self.frame_items(data.frame), mode='clip')
         # choose a single terrain item randomly and subtitute it with a person
         data.frame, data.adj_matrix, data.height_map, data.person_coord_list =\
             self.place_people_on_frame(
                 frame=data.frame,
                 adj_matrix=data.adj_matrix,
                 height_map=data.height_map,
-                people_quantity=people_quantity
+                people_quantity=people_quantity,
+                rng=rng
             )
         if place_helipad:
             data.frame, data.adj_matrix, data.height_map, data.helipad_coord =\
@@ -369,5 +474,6 @@ class RandomAerialImageDataGenerator(object):
                     frame=data.frame,
                     adj_matrix=data.adj_matrix,
                     height_map=data.height_map,
+                    rng=rng
                 )
         return data
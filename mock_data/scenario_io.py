@@ -0,0 +1,134 @@
+import json
+import os
+import struct
+
+import numpy as np
+from mock_data.data import AerialImageData
+
+# File layout: MAGIC, then the format version and the length of the JSON
+# header as little-endian uint32, then the header, then every section
+# starting at a multiple of SECTION_ALIGNMENT bytes.
+MAGIC = b'AERIALSC'
+VERSION = 1
+SECTION_ALIGNMENT = 64
+_PREAMBLE = struct.Struct('<8sII')
+
+SECTION_DTYPES = {
+    'adj_matrix': np.int8,
+    'height_map': None,  # kept as is, usually float32
+    'frame': None,
+}
+
+
+def _align(offset):
+    return -(-offset // SECTION_ALIGNMENT) * SECTION_ALIGNMENT
+
+
+def save_scenario(path, data):
+    """Write an AerialImageData to a versioned binary file.
+
+    Labels are stored as int8. The person and helipad coordinates go in a
+    small JSON header, and each array in its own aligned section, so
+    load_scenario can memory-map them separately.
+
+    Parameters
+    ----------
+    path : str
+        Path of the file.
+    data : AerialImageData
+        Scenario to write. Arrays that are None are left out.
+
+    """
+    sections = {}
+    for name, dtype in SECTION_DTYPES.items():
+        array = getattr(data, name)
+        if array is not None:
+            sections[name] = np.ascontiguousarray(
+                array if dtype is None else np.asarray(array).astype(dtype)
+            )
+    header = {
+        'person_coord_list': None if data.person_coord_list is None
+        else np.asarray(data.person_coord_list).astype(int).tolist(),
+        'helipad_coord': None if data.helipad_coord is None
+        else np.asarray(data.helipad_coord).astype(int).tolist(),
+        'sections': {},
+    }
+    # Offsets are relative to the first aligned byte after the header, so
+    # they don't depend on the header length.
+    offset = 0
+    for name, array in sections.items():
+        header['sections'][name] = {
+            'dtype': array.dtype.str,
+            'shape': list(array.shape),
+            'offset': offset,
+        }
+        offset = _align(offset + array.nbytes)
+    header_bytes = json.dumps(header, sort_keys=True).encode()
+    data_start = _align(_PREAMBLE.size + len(header_bytes))
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as file:
+        file.write(_PREAMBLE.pack(MAGIC, VERSION, len(header_bytes)))
+        file.write(header_bytes)
+        for name, array in sections.items():
+            file.seek(data_start + header['sections'][name]['offset'])
+            if array.nbytes:
+                file.write(memoryview(array.reshape(-1)).cast('B'))
+    os.replace(tmp_path, path)
+
+
+def load_scenario(path, with_frame=True, mmap_mode='r'):
+    """Read a file written by save_scenario.
+
+    The arrays are memory-mapped: only the header is read, and the bytes of
+    a section are only read when the array is accessed. Planning, which
+    needs the adj_matrix, the height_map and the coordinates, never touches
+    the frame.
+
+    Parameters
+    ----------
+    path : str
+        Path of the file.
+    with_frame : bool
+        Whether to map the frame. If False, frame is None.
+    mmap_mode : str
+        np.memmap mode, i.e 'r' or 'c' for arrays that can be modified in memory only.
+
+    Returns
+    -------
+    AerialImageData
+        The scenario, with numpy.memmap arrays.
+
+    """
+    with open(path, 'rb') as file:
+        magic, version, header_length = _PREAMBLE.unpack(
+            file.read(_PREAMBLE.size)
+        )
+        if magic != MAGIC:
+            raise ValueError('{} is not a scenario file'.format(path))
+        if version > VERSION:
+            raise ValueError(
+                '{} has version {}, the newest supported is {}'
+                .format(path, version, VERSION)
+            )
+        header = json.loads(file.read(header_length).decode())
+    data_start = _align(_PREAMBLE.size + header_length)
+
+    arrays = {}
+    for name, section in header['sections'].items():
+        if name == 'frame' and not with_frame:
+            continue
+        shape = tuple(section['shape'])
+        if not np.prod(shape):
+            arrays[name] = np.empty(shape, dtype=section['dtype'])
+            continue
+        arrays[name] = np.memmap(path, dtype=section['dtype'],
+                                 mode=mmap_mode, shape=shape,
+                                 offset=data_start + section['offset'])
+    return AerialImageData(
+        frame=arrays.get('frame'),
+        adj_matrix=arrays.get('adj_matrix'),
+        height_map=arrays.get('height_map'),
+        person_coord_list=header['person_coord_list'],
+        helipad_coord=header['helipad_coord'],
+    )
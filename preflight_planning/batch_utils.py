@@ -0,0 +1,186 @@
+import numpy as np
+
+PARAMS_FIELDS = ['speed', 'landing_time', 'takeoff_time',
+                 'maximum_flight_time', 'num_packets']
+
+
+def params_table(params_list):
+    """Stack Params objects into the parameter table of find_routes_batch.
+
+    Parameters
+    ----------
+    params_list : list
+        Params of each scenario.
+
+    Returns
+    -------
+    dict
+        numpy.ndarray of each field used by find_routes, indexed by scenario.
+
+    """
+    return {
+        field: np.array([getattr(params, field) for params in params_list],
+                        dtype=np.float64)
+        for field in PARAMS_FIELDS
+    }
+
+
+def find_routes_batch(coords, mask, home_coords, params):
+    """Greedy find_routes over a batch of scenarios at once, vectorized along the scenario axis.
+
+    Each step of the loop visits one person in every scenario still
+    running, with the same choices, ties and floating point operations as
+    find_routes. People that don't fit even in a route of their own, where
+    find_routes raises ValueError, are left unassigned and their scenario
+    is reported as not done.
+
+    Parameters
+    ----------
+    coords : numpy.ndarray
+        (num_scenarios, max_people, 2) coordinates of the people, padded.
+    mask : numpy.ndarray
+        (num_scenarios, max_people) boolean, True where coords holds a person.
+    home_coords : numpy.ndarray
+        (num_scenarios, 2) coordinate of the home of each scenario.
+    params : dict
+        Parameter table, i.e from params_table. Each field of PARAMS_FIELDS holds a value or an array with one value per scenario.
+
+    Returns
+    -------
+    dict
+        route_of : (num_scenarios, max_people) route of each person, -1 if unassigned.
+        visit_order : (num_scenarios, max_people) position of each person in the visiting order, -1 if unassigned.
+        elapsed_time : (num_scenarios, max_people) elapsed time of each route, 0 after num_routes.
+        num_routes : (num_scenarios,) number of routes.
+        done : (num_scenarios,) False where find_routes would raise ValueError.
+
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    mask = np.asarray(mask, dtype=bool)
+    home_coords = np.asarray(home_coords, dtype=np.float64)
+    num_scenarios, max_people = mask.shape
+    speed, landing_time, takeoff_time, maximum_flight_time, num_packets = [
+        np.broadcast_to(np.asarray(params[field], dtype=np.float64),
+                        (num_scenarios,))
+        for field in PARAMS_FIELDS
+    ]
+    max_time = maximum_flight_time * 60
+    x, y = coords[:, :, 0], coords[:, :, 1]
+    scenarios = np.arange(num_scenarios)
+
+    def distances_from(curr_x, curr_y):
+        dx = curr_x[:, None] - x
+        dy = curr_y[:, None] - y
+        return np.sqrt(dx * dx + dy * dy)
+
+    def closest(curr_x, curr_y):
+        # min(zip(distances, coords)) of find_routes, row by row.
+        distances = np.where(remaining,
+                             distances_from(curr_x, curr_y)
+                             + distances_to_home,
+                             np.inf)
+        closest_dist = distances.min(axis=1)
+        candidates = distances == closest_dist[:, None]
+        for axis_coords in (x, y):
+            best = np.where(candidates, axis_coords, np.inf).min(axis=1)
+            candidates &= axis_coords == best[:, None]
+        return candidates.argmax(axis=1), closest_dist
+
+    def visit_times(distance_to_next, distance_to_home):
+        # find_routes_visit_times and find_routes_return_time.
+        time_to_next = takeoff_time + distance_to_next / speed + landing_time
+        return time_to_next, time_to_next + return_time(distance_to_home)
+
+    def return_time(distance_to_home):
+        return takeoff_time + distance_to_home / speed + landing_time
+
+    distances_to_home = distances_from(home_coords[:, 0], home_coords[:, 1])
+    _, solo_time = visit_times(distances_to_home.T, distances_to_home.T)
+    remaining = mask & (solo_time.T <= max_time[:, None])
+    route_of = np.full((num_scenarios, max_people), -1, dtype=np.int32)
+    visit_order = np.full((num_scenarios, max_people), -1, dtype=np.int32)
+    elapsed_time = np.zeros((num_scenarios, max_people))
+    route_idx = np.zeros(num_scenarios, dtype=np.int32)
+    route_len = np.zeros(num_scenarios, dtype=np.int32)
+    num_visited = np.zeros(num_scenarios, dtype=np.int32)
+    # Each route starts at home, and then goes on from its last person.
+    curr_idx = np.zeros(num_scenarios, dtype=np.intp)
+
+    running = remaining.any(axis=1)
+    while running.any():
+        at_home = route_len == 0
+        next_idx, closest_dist = closest(
+            np.where(at_home, home_coords[:, 0], x[scenarios, curr_idx]),
+            np.where(at_home, home_coords[:, 1], y[scenarios, curr_idx])
+        )
+        distance_to_home = distances_to_home[scenarios, next_idx]
+        time_to_next, time_to_home = visit_times(
+            np.where(at_home, distance_to_home,
+                     closest_dist - distance_to_home),
+            distance_to_home
+        )
+        # Scenarios that are done may have used every route.
+        elapsed = elapsed_time[scenarios,
+                               np.minimum(route_idx, max_people - 1)]
+        fits = running & (elapsed + time_to_home <= max_time)
+
+        rows, people = scenarios[fits], next_idx[fits]
+        route_of[rows, people] = route_idx[rows]
+        visit_order[rows, people] = num_visited[rows]
+        elapsed_time[rows, route_idx[rows]] += time_to_next[rows]
+        remaining[rows, people] = False
+        num_visited[rows] += 1
+        route_len[rows] += 1
+        curr_idx = np.where(fits, next_idx, curr_idx)
+        # Remember the home coord is in the route when measuring its len.
+        back_home = running & ((fits & (num_packets < route_len + 1)) | ~fits)
+        running &= remaining.any(axis=1)
+        back_home |= ~running & (route_len > 0)
+        rows = scenarios[back_home]
+        elapsed_time[rows, route_idx[rows]] += return_time(
+            distances_to_home[scenarios, curr_idx]
+        )[rows]
+        route_idx[back_home] += 1
+        route_len[back_home] = 0
+
+    return {
+        'route_of': route_of,
+        'visit_order': visit_order,
+        'elapsed_time': elapsed_time,
+        'num_routes': route_idx,
+        'done': ~(mask & (route_of == -1)).any(axis=1),
+    }
+
+
+def batch_routes(result, coords, home_coords, scenario_idx):
+    """Expand one scenario of find_routes_batch into the output of find_routes.
+
+    Parameters
+    ----------
+    result : dict
+        Output of find_routes_batch.
+    coords : numpy.ndarray
+        coords given to find_routes_batch.
+    home_coords : numpy.ndarray
+        home_coords given to find_routes_batch.
+    scenario_idx : int
+        Scenario to expand.
+
+    Returns
+    -------
+    (list, list)
+        Routes and elapsed time of each route, like find_routes.
+
+    """
+    home_coord = np.asarray(home_coords[scenario_idx]).tolist()
+    visit_order = result['visit_order'][scenario_idx]
+    route_of = result['route_of'][scenario_idx]
+    num_routes = int(result['num_routes'][scenario_idx])
+    routes = [[home_coord] for _ in range(num_routes)]
+    for person in np.argsort(visit_order, kind='stable').tolist():
+        if visit_order[person] != -1:
+            routes[route_of[person]].append(
+                np.asarray(coords[scenario_idx][person]).tolist()
+            )
+    return [route + [home_coord] for route in routes], \
+        result['elapsed_time'][scenario_idx, :num_routes].tolist()
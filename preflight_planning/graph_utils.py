@@ -1,4 +1,8 @@
 import numpy as np
+from landing_zone_detection.graph_utils import timed_phase
+from preflight_planning.savings_utils import find_routes_savings
+from preflight_planning.spatial_utils import RemainingPointsIndex, \
+    RemainingPointsMatrix
 
 
 class Params(object):
@@ -7,76 +11,179 @@ class Params(object):
                  landing_time,
                  takeoff_time,
                  maximum_flight_time,
-#                 reload_time,
-#                 battery_switching_time,
-#                 total_number_of_batteries,
-#                 num_mav,
                  num_people,
-                 num_packets):
+                 num_packets,
+                 reload_time=None,
+                 battery_switching_time=None,
+                 total_number_of_batteries=None,
+                 num_mav=None):
         self.speed = speed
         self.landing_time = landing_time
         self.takeoff_time = takeoff_time
         self.maximum_flight_time = maximum_flight_time
-#        self.reload_time = reload_time  # TODO
-#        self.battery_switching_time = battery_switching_time  # TODO
-#        self.total_number_of_batteries = total_number_of_batteries  # TODO
-#        self.num_mav = num_mav
         self.num_people = num_people
         self.num_packets = num_packets
+        # Used by schedule_utils.schedule_takeoffs. They come last, so the
+        # positional arguments of find_routes keep working.
+        self.reload_time = reload_time
+        self.battery_switching_time = battery_switching_time
+        self.total_number_of_batteries = total_number_of_batteries
+        self.num_mav = num_mav
 
 
 def find_routes(person_coord_list,
                 adj_matrix_shape,  # used just for simulation purposes
                 home_coord,
-                params):
-    person_coord_list = person_coord_list[:]
-    distances_to_home = np.linalg.norm(
-        np.array(home_coord) - np.array(person_coord_list),
-        axis=1
-    )
-    elapsed_time_list = [0]
-    # all routes start at the home coordinate
-    routes = [[home_coord]]
-    route_idx = 0
-    next_coord, time_to_next, time_to_home = find_routes_visit(
-        curr_coord=home_coord,
-        nb_coord_list=person_coord_list,
-        distances_to_home=distances_to_home,
-        adj_matrix_shape=adj_matrix_shape,
-        params=params
-    )
-    loop_idx = -1
-    while len(person_coord_list) != 0:
-        loop_idx += 1
-        next_coord, time_to_next, time_to_home = find_routes_visit(
-            curr_coord=next_coord,
-            nb_coord_list=person_coord_list,
-            distances_to_home=distances_to_home,
+                params,
+                stats=None,
+                on_expand=None,
+                solver='greedy',
+                distance_matrix=None):
+    # solver='savings' delegates to savings_utils.find_routes_savings, which
+    # always terminates and raises ValueError if someone can't be served.
+    # Savings is a heuristic too: it usually needs less total flight time
+    # than greedy, but not always, so the greedy routes are built as well
+    # and the cheaper of both is returned. distance_matrix replaces the
+    # straight lines between the people, i.e with
+    # savings_utils.landing_zone_distance_matrix.
+    if solver == 'savings':
+        routes, elapsed_time_list, infeasible = find_routes_savings(
+            person_coord_list=person_coord_list,
+            home_coord=home_coord,
+            params=params,
+            distance_matrix=distance_matrix,
+            stats=stats
+        )
+        if infeasible:
+            raise ValueError(
+                'No route can serve the people at: {}'.format(infeasible)
+            )
+        greedy_routes, greedy_elapsed_time_list = find_routes(
+            person_coord_list=person_coord_list,
             adj_matrix_shape=adj_matrix_shape,
-            params=params
+            home_coord=home_coord,
+            params=params,
+            stats=stats,
+            distance_matrix=distance_matrix
         )
-        if (((params.maximum_flight_time*60-time_to_home) > 0)
-                and ((params.maximum_flight_time*60-time_to_next) > 0)):
-            # Remember the home coord is in routes when measuring its len.
-            if params.num_packets < len(routes[route_idx]):
-                route_idx += 1
-                routes.append([home_coord])
-                elapsed_time_list.append(0)
-            routes[route_idx].append(next_coord)
-            elapsed_time_list[route_idx] += time_to_next
-            idx = person_coord_list.index(next_coord)
-            del person_coord_list[idx]
-            distances_to_home = np.delete(distances_to_home, idx)
+        if sum(greedy_elapsed_time_list) < sum(elapsed_time_list):
+            return greedy_routes, greedy_elapsed_time_list
+        return routes, elapsed_time_list
+    if solver != 'greedy':
+        raise ValueError('Unknown solver: {}'.format(solver))
     routes_clean = []
     elapsed_time_list_clean = []
-    for i in range(len(routes)):
-        if len(routes[i]) <= 1:
-            continue
-        routes_clean.append(routes[i] + [home_coord])
-        elapsed_time_list_clean.append(elapsed_time_list[i])
+    with timed_phase(stats, 'routing'):
+        for route, elapsed_time in iter_routes(
+                person_coord_list=person_coord_list,
+                adj_matrix_shape=adj_matrix_shape,
+                home_coord=home_coord,
+                params=params,
+                stats=stats,
+                on_expand=on_expand,
+                distance_matrix=distance_matrix):
+            routes_clean.append(route)
+            elapsed_time_list_clean.append(elapsed_time)
     return routes_clean, elapsed_time_list_clean
 
 
+def iter_routes(person_coord_list,
+                adj_matrix_shape,  # used just for simulation purposes
+                home_coord,
+                params,
+                stats=None,
+                on_expand=None,
+                distance_matrix=None):
+    # Greedy solver of find_routes as a generator. Each (route, elapsed_time)
+    # is yielded as soon as the route is full, or the next person doesn't
+    # fit in its flight time, so the first MAV can take off while the rest
+    # is planned. The last route is yielded when everyone has been assigned.
+    # list(iter_routes(...)) matches find_routes.
+    if distance_matrix is not None:
+        unreachable = ~np.isfinite(np.asarray(distance_matrix)[1:, 0])
+        if unreachable.any():
+            raise ValueError('No route can serve the people at: {}'.format(
+                [person_coord_list[k] for k in np.flatnonzero(unreachable)]
+            ))
+    # stats is an optional landing_zone_detection SearchStats. Each visit
+    # counts as an expansion, each candidate evaluated as an edge relaxation
+    # and each visit that couldn't be added to a route as a re-expansion.
+    # on_expand(next_coord, time_to_next) is called on each visit.
+    instrumented = stats is not None or on_expand is not None
+    nodes_expanded = edge_relaxations = reexpansions = 0
+    max_frontier = len(person_coord_list)
+    # Remaining people are kept in a spatial index instead of being
+    # deleted from the list, which made each visit O(n).
+    if distance_matrix is None:
+        index = RemainingPointsIndex(person_coord_list, home_coord)
+    else:
+        index = RemainingPointsMatrix(person_coord_list, distance_matrix)
+    distances_to_home = index.distances_to_home.tolist()
+    max_time = params.maximum_flight_time * 60
+    # People that don't fit even in a route of their own would make the
+    # loop below spin forever.
+    infeasible = [
+        person_coord_list[k] for k, distance_to_home
+        in enumerate(distances_to_home)
+        if not find_routes_visit_times(distance_to_home, distance_to_home,
+                                       params)[1] <= max_time
+    ]
+    if infeasible:
+        raise ValueError(
+            'No route can serve the people at: {}'.format(infeasible)
+        )
+    # all routes start at the home coordinate
+    route = [home_coord]
+    elapsed_time = 0
+    curr_idx = -1
+    try:
+        while index.num_remaining != 0:
+            if instrumented:
+                nodes_expanded += 1
+                edge_relaxations += index.num_remaining
+            next_idx, closest_dist = index.nearest(curr_idx)
+            next_coord = person_coord_list[next_idx]
+            distance_to_home = distances_to_home[next_idx]
+            time_to_next, time_to_home = find_routes_visit_times(
+                distance_to_next=distance_to_home if curr_idx == -1
+                else closest_dist - distance_to_home,
+                distance_to_home=distance_to_home,
+                params=params
+            )
+            if on_expand is not None:
+                on_expand(next_coord, time_to_next)
+            if elapsed_time + time_to_home <= max_time:
+                route.append(next_coord)
+                elapsed_time += time_to_next
+                index.remove(next_idx)
+                curr_idx = next_idx
+                # Remember the home coord is in route when measuring its len.
+                if params.num_packets >= len(route):
+                    continue
+            elif instrumented:
+                reexpansions += 1
+            # The route is full, or the next person doesn't fit in it: go
+            # back home. A new route always fits its first person.
+            yield route + [home_coord], \
+                elapsed_time + find_routes_return_time(
+                    distances_to_home[curr_idx], params
+                )
+            route = [home_coord]
+            elapsed_time = 0
+            curr_idx = -1
+        if len(route) > 1:
+            yield route + [home_coord], \
+                elapsed_time + find_routes_return_time(
+                    distances_to_home[curr_idx], params
+                )
+    finally:
+        if stats is not None:
+            stats.nodes_expanded += nodes_expanded
+            stats.edge_relaxations += edge_relaxations
+            stats.reexpansions += reexpansions
+            stats.max_frontier = max(stats.max_frontier, max_frontier)
+
+
 def find_routes_visit(curr_coord, nb_coord_list,
                    distances_to_home,
                    adj_matrix_shape, params):
@@ -86,22 +193,29 @@ def find_routes_visit(curr_coord, nb_coord_list,
     )
     distances += distances_to_home
     closest_dist, closest_coord = min(zip(distances, nb_coord_list))
-    # takeoff once to exit curr_coord
-    elapsed_time = params.takeoff_time
-    # go to the closest nb_coord (and come back to the home)
-    elapsed_time += params.speed / closest_dist
-    # land at the coord
-    elapsed_time += params.landing_time
-    # takeoff again
-    elapsed_time += params.takeoff_time
-    # time to go to the next coord
-    time_to_next = elapsed_time - (
-        params.speed / distances_to_home[nb_coord_list.index(closest_coord)]
+    distance_to_home = distances_to_home[nb_coord_list.index(closest_coord)]
+    time_to_next, time_to_home = find_routes_visit_times(
+        distance_to_next=closest_dist - distance_to_home,
+        distance_to_home=distance_to_home,
+        params=params
     )
-    # bat_next = params.maximum_flight_time - elapsed_time
-    # land again
-    elapsed_time += params.landing_time
-    # time to go to the next coord, then to go back home
-    time_to_home = elapsed_time
-    # bat_home = params.maximum_flight_time - elapsed_time
     return closest_coord, time_to_next, time_to_home
+
+
+def find_routes_visit_times(distance_to_next, distance_to_home, params):
+    # Same model as savings_utils.route_flight_time: each leg costs a
+    # takeoff, the distance divided by the speed, and a landing.
+    # takeoff to exit the current coord, fly to the next one and land there
+    time_to_next = params.takeoff_time
+    time_to_next += distance_to_next / params.speed
+    time_to_next += params.landing_time
+    # then takeoff again to go back home
+    time_to_home = time_to_next + find_routes_return_time(distance_to_home,
+                                                          params)
+    return time_to_next, time_to_home
+
+
+def find_routes_return_time(distance_to_home, params):
+    # takeoff, fly back home and land
+    return params.takeoff_time + distance_to_home / params.speed \
+        + params.landing_time
@@ -0,0 +1,348 @@
+import numpy as np
+from landing_zone_detection.graph_utils import LandingZoneField, \
+    timed_phase
+from landing_zone_detection.label_utils import can_a_person_reach, \
+    can_uav_land
+
+
+def route_distance_matrix(person_coord_list, home_coord):
+    """Straight-line distances between home and every person.
+
+    Parameters
+    ----------
+    person_coord_list : list of lists
+        (x, y) coordinates of the people supposed to receive supplies or deliveries.
+    home_coord : list
+        (x, y) coordinate where every route starts and ends.
+
+    Returns
+    -------
+    numpy.ndarray
+        (n + 1, n + 1) matrix. The row and column 0 are home, the row and column k are person_coord_list[k - 1].
+
+    """
+    points = np.vstack([
+        np.reshape(home_coord, (1, 2)),
+        np.reshape(person_coord_list, (len(person_coord_list), 2)),
+    ]).astype(np.float64)
+    return np.hypot(points[:, None, 0] - points[None, :, 0],
+                    points[:, None, 1] - points[None, :, 1])
+
+
+def landing_zone_distance_matrix(person_coord_list, helipad_coord,
+                                 adj_matrix, height_map, field=None):
+    """Straight-line distances between the helipad and the landing zone of every person.
+
+    The MAVs land at the landing zone closest to each person, not on the
+    person. The landing zones come from a single LandingZoneField of the
+    map instead of a find_landing_zone call per person.
+
+    Parameters
+    ----------
+    person_coord_list : list of lists
+        (x, y) coordinates in the adj_matrix of the people supposed to receive supplies or deliveries.
+    helipad_coord : list
+        (x, y) coordinate of the helipad, i.e AerialImageData.helipad_coord.
+    adj_matrix : numpy.ndarray
+        Adjacent matrix where the meaning of each value is specified in the label_utils.py module.
+    height_map : numpy.ndarray
+        Depth estimation of the frame. Same shape as the adj_matrix.
+    field : LandingZoneField
+        Field of the map, i.e from a LandingZoneCache. Built if not given.
+
+    Returns
+    -------
+    (numpy.ndarray, list)
+        Matrix laid out like route_distance_matrix and the landing zone coordinate of each person. People without a landing zone get None and inf distances.
+
+    """
+    if field is None:
+        field = LandingZoneField(adj_matrix=adj_matrix,
+                                 height_map=height_map)
+    landing_zone_coord_list = []
+    for person_coord in person_coord_list:
+        label = field.adj_matrix[person_coord[0], person_coord[1]]
+        if can_a_person_reach(label) and not can_uav_land(label):
+            idx = int(field.landing_zones[person_coord[0], person_coord[1]])
+            landing_zone_coord_list.append(
+                None if idx == -1 else list(divmod(idx, field.shape[1]))
+            )
+        else:
+            # The field doesn't cover these people, see its query method.
+            shortest_path, _ = field.query(person_coord)
+            landing_zone_coord_list.append(
+                shortest_path[-1] if shortest_path else None
+            )
+    unreachable = np.array([coord is None
+                            for coord in landing_zone_coord_list], dtype=bool)
+    distance_matrix = route_distance_matrix(
+        [coord if coord is not None else helipad_coord
+         for coord in landing_zone_coord_list],
+        helipad_coord
+    )
+    distance_matrix[1:][unreachable] = np.inf
+    distance_matrix[:, 1:][:, unreachable] = np.inf
+    return distance_matrix, landing_zone_coord_list
+
+
+def route_flight_time(route, distance_matrix, params):
+    """Flight time of a route that leaves home, visits people and comes back.
+
+    Each leg costs a takeoff, the distance divided by params.speed, and a
+    landing.
+
+    Parameters
+    ----------
+    route : list
+        Rows of the distance_matrix of the people visited, in order, without home.
+    distance_matrix : numpy.ndarray
+        Output of route_distance_matrix or any symmetric matrix with the same layout.
+    params : Params
+        Speed, takeoff and landing times of the MAV.
+
+    Returns
+    -------
+    float
+        Flight time of the route, in the unit of params.maximum_flight_time * 60.
+
+    """
+    stops = [0] + list(route) + [0]
+    distance = sum(float(distance_matrix[a, b])
+                   for a, b in zip(stops[:-1], stops[1:]))
+    return (len(stops) - 1) * (params.takeoff_time + params.landing_time) \
+        + distance / params.speed
+
+
+def find_routes_savings(person_coord_list, home_coord, params,
+                        distance_matrix=None, num_neighbours=32,
+                        max_passes=20, stats=None):
+    """Build routes with the Clarke-Wright savings algorithm, then improve them with 2-opt and relocate moves.
+
+    Every person starts in a route of its own. Pairs of routes are merged
+    end to end in decreasing order of the time their merge saves, as long as
+    the merged route carries at most params.num_packets people and its
+    route_flight_time fits in params.maximum_flight_time. Only pairs among
+    the num_neighbours closest people of each person are considered, which
+    keeps thousands of people tractable. The routes are then improved by
+    reversing segments inside a route (2-opt) and by moving a person next to
+    one of its neighbours in another route (relocate), until no move
+    improves the total flight time or max_passes is reached.
+
+    Unlike find_routes, it always terminates. People that can't be served
+    even by a route of their own are left out and reported.
+
+    Parameters
+    ----------
+    person_coord_list : list of lists
+        (x, y) coordinates of the people supposed to receive supplies or deliveries.
+    home_coord : list
+        (x, y) coordinate where every route starts and ends.
+    params : Params
+        MAV parameters. num_packets and maximum_flight_time are the constraints.
+    distance_matrix : numpy.ndarray
+        Symmetric (n + 1, n + 1) matrix laid out like route_distance_matrix, which is used if it's None.
+    num_neighbours : int
+        Number of closest people of each person considered by the merges and the relocate moves.
+    max_passes : int
+        Maximum number of local search passes.
+    stats : SearchStats
+        Optional landing_zone_detection SearchStats where the phase timings are added.
+
+    Returns
+    -------
+    (list, list, list)
+        Routes, starting and ending at home_coord, their route_flight_time and the coordinates of the people left out.
+
+    """
+    num_people = len(person_coord_list)
+    if num_people == 0:
+        return [], [], []
+    with timed_phase(stats, 'distance_matrix'):
+        if distance_matrix is None:
+            distance_matrix = route_distance_matrix(person_coord_list,
+                                                    home_coord)
+        distance_matrix = np.asarray(distance_matrix, dtype=np.float64)
+    leg_time = params.takeoff_time + params.landing_time
+    speed = params.speed
+    max_time = params.maximum_flight_time * 60
+    home_distances = distance_matrix[0].tolist()
+
+    def fits(num_stops, distance):
+        return num_stops <= params.num_packets \
+            and (num_stops + 1) * leg_time + distance / speed <= max_time
+
+    with timed_phase(stats, 'savings'):
+        people = [k for k in range(1, num_people + 1)
+                  if fits(1, 2 * home_distances[k])]
+        infeasible = sorted(set(range(1, num_people + 1)) - set(people))
+        routes = {k: [k] for k in people}
+        route_of = {k: k for k in people}
+        route_distances = {k: 2 * home_distances[k] for k in people}
+
+        neighbours = _closest_neighbours(distance_matrix, people,
+                                         num_neighbours)
+        pairs = {(min(i, j), max(i, j))
+                 for i, nbs in zip(people, neighbours) for j in nbs}
+        pairs = sorted(pairs, key=lambda pair: (
+            -(home_distances[pair[0]] + home_distances[pair[1]]
+              - distance_matrix[pair[0], pair[1]]),
+            pair
+        ))
+        for i, j in pairs:
+            route_i, route_j = route_of[i], route_of[j]
+            if route_i == route_j:
+                continue
+            stops_i, stops_j = routes[route_i], routes[route_j]
+            # Merges only join the ends of two routes.
+            if i not in (stops_i[0], stops_i[-1]) \
+                    or j not in (stops_j[0], stops_j[-1]):
+                continue
+            saving = home_distances[i] + home_distances[j] \
+                - distance_matrix[i, j]
+            # The merged route saves a landing and a takeoff at home.
+            if leg_time + saving / speed <= 0:
+                continue
+            distance = route_distances[route_i] + route_distances[route_j] \
+                - saving
+            if not fits(len(stops_i) + len(stops_j), distance):
+                continue
+            if stops_i[-1] != i:
+                stops_i.reverse()
+            if stops_j[0] != j:
+                stops_j.reverse()
+            stops_i.extend(stops_j)
+            route_distances[route_i] = distance
+            for k in stops_j:
+                route_of[k] = route_i
+            del routes[route_j], route_distances[route_j]
+
+    with timed_phase(stats, 'local_search'):
+        for _ in range(max_passes):
+            improved = False
+            for route in routes:
+                if _two_opt(routes[route], distance_matrix):
+                    improved = True
+                    route_distances[route] = _route_distance(routes[route],
+                                                             distance_matrix)
+            for i, nbs in zip(people, neighbours):
+                if _relocate(i, nbs, routes, route_of, route_distances,
+                             distance_matrix, fits, params.num_packets,
+                             leg_time, speed):
+                    improved = True
+            if not improved:
+                break
+
+    routes_clean = []
+    elapsed_time_list = []
+    for route in sorted(routes.values()):
+        routes_clean.append([home_coord]
+                            + [person_coord_list[k - 1] for k in route]
+                            + [home_coord])
+        elapsed_time_list.append(route_flight_time(route, distance_matrix,
+                                                   params))
+    return routes_clean, elapsed_time_list, \
+        [person_coord_list[k - 1] for k in infeasible]
+
+
+def _closest_neighbours(distance_matrix, people, num_neighbours,
+                        chunk_size=512):
+    """Closest num_neighbours people of each person, closest first."""
+    people = np.asarray(people)
+    num_neighbours = min(num_neighbours, len(people) - 1)
+    if num_neighbours <= 0:
+        return [[] for _ in range(len(people))]
+    neighbours = []
+    # Chunks keep the copy of the rows small when there are many people.
+    for start in range(0, len(people), chunk_size):
+        rows = people[start:start + chunk_size]
+        distances = distance_matrix[np.ix_(rows, people)]
+        distances[np.arange(len(rows)), np.arange(start, start + len(rows))] \
+            = np.inf
+        closest = np.argpartition(distances, num_neighbours - 1,
+                                  axis=1)[:, :num_neighbours]
+        order = np.argsort(
+            np.take_along_axis(distances, closest, axis=1), axis=1,
+            kind='stable'
+        )
+        neighbours.extend(
+            people[np.take_along_axis(closest, order, axis=1)].tolist()
+        )
+    return neighbours
+
+
+def _route_distance(route, distance_matrix):
+    """Distance of a route from home back to home."""
+    stops = [0] + route + [0]
+    return sum(float(distance_matrix[a, b])
+               for a, b in zip(stops[:-1], stops[1:]))
+
+
+def _two_opt(route, distance_matrix):
+    """Reverse segments of the route in place while that shortens it. Returns whether it changed."""
+    changed = False
+    improved = True
+    while improved:
+        improved = False
+        stops = [0] + route + [0]
+        for start in range(1, len(stops) - 2):
+            for stop in range(start + 1, len(stops) - 1):
+                delta = distance_matrix[stops[start - 1], stops[stop]] \
+                    + distance_matrix[stops[start], stops[stop + 1]] \
+                    - distance_matrix[stops[start - 1], stops[start]] \
+                    - distance_matrix[stops[stop], stops[stop + 1]]
+                if delta < -1e-9:
+                    stops[start:stop + 1] = stops[start:stop + 1][::-1]
+                    improved = changed = True
+        route[:] = stops[1:-1]
+    return changed
+
+
+def _relocate(i, nbs, routes, route_of, route_distances, distance_matrix,
+              fits, num_packets, leg_time, speed):
+    """Move i next to one of its neighbours in another route if that saves flight time. Returns whether it moved."""
+    source = route_of[i]
+    source_stops = routes[source]
+    position = source_stops.index(i)
+    prev = source_stops[position - 1] if position > 0 else 0
+    next_ = source_stops[position + 1] \
+        if position + 1 < len(source_stops) else 0
+    removal = distance_matrix[prev, next_] - distance_matrix[prev, i] \
+        - distance_matrix[i, next_]
+    if len(source_stops) == 1:
+        # The source route disappears with both its legs.
+        source_delta = -2 * leg_time + removal / speed
+    else:
+        source_delta = -leg_time + removal / speed
+        if not fits(len(source_stops) - 1,
+                    route_distances[source] + removal):
+            return False
+    for j in nbs:
+        target = route_of[j]
+        if target == source:
+            continue
+        target_stops = routes[target]
+        if len(target_stops) >= num_packets:
+            continue
+        position_j = target_stops.index(j)
+        # Try to insert i right before and right after j.
+        for insert_at in (position_j, position_j + 1):
+            before = target_stops[insert_at - 1] if insert_at > 0 else 0
+            after = target_stops[insert_at] \
+                if insert_at < len(target_stops) else 0
+            insertion = distance_matrix[before, i] \
+                + distance_matrix[i, after] - distance_matrix[before, after]
+            if source_delta + leg_time + insertion / speed >= -1e-9:
+                continue
+            if not fits(len(target_stops) + 1,
+                        route_distances[target] + insertion):
+                continue
+            target_stops.insert(insert_at, i)
+            route_of[i] = target
+            route_distances[target] += insertion
+            del source_stops[position]
+            if source_stops:
+                route_distances[source] += removal
+            else:
+                del routes[source], route_distances[source]
+            return True
+    return False
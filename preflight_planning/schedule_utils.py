@@ -0,0 +1,63 @@
+import heapq
+
+
+def schedule_takeoffs(routes, elapsed_time_list, params,
+                      battery_charging_time=None):
+    """Schedule the take-offs of the routes found by find_routes over a fleet of MAVs.
+
+    Discrete-event simulation with a heap of the times at which each MAV is
+    back home and a heap of the times at which each battery is charged.
+    Routes are taken in order, and each one goes to the first MAV back home.
+    Before taking off, the MAV waits for a charged battery, then is reloaded
+    and gets its battery switched. The depleted battery is charged again
+    battery_charging_time after the MAV lands.
+
+    Parameters
+    ----------
+    routes : list
+        Routes returned by find_routes.
+    elapsed_time_list : list
+        Flight time of each route, returned by find_routes.
+    params : Params
+        num_mav is required. reload_time and battery_switching_time default to 0, and total_number_of_batteries to one per route.
+    battery_charging_time : float
+        Time to charge a depleted battery. If None, depleted batteries are not charged again.
+
+    Returns
+    -------
+    (list, float)
+        Timetable, in take-off order, of (route_idx, mav_idx, takeoff_time, landing_time) tuples, and the makespan: the time when the last MAV is back home.
+
+    """
+    if not params.num_mav or params.num_mav < 1:
+        raise ValueError('params.num_mav must be at least 1')
+    reload_time = params.reload_time or 0
+    battery_switching_time = params.battery_switching_time or 0
+    num_batteries = params.total_number_of_batteries
+    if num_batteries is None:
+        num_batteries = len(routes)
+    if routes and num_batteries < 1:
+        raise ValueError('There are no batteries')
+    if battery_charging_time is None and num_batteries < len(routes):
+        raise ValueError(
+            '{} batteries are not enough for {} routes without charging'
+            .format(num_batteries, len(routes))
+        )
+
+    mavs = [(0.0, mav_idx) for mav_idx in range(params.num_mav)]
+    batteries = [0.0] * num_batteries
+    timetable = []
+    makespan = 0.0
+    # Both heaps only pop increasing times, so the take-offs come in order.
+    for route_idx, elapsed_time in enumerate(elapsed_time_list):
+        available_time, mav_idx = heapq.heappop(mavs)
+        battery_time = heapq.heappop(batteries)
+        takeoff_time = max(available_time, battery_time) \
+            + reload_time + battery_switching_time
+        landing_time = takeoff_time + elapsed_time
+        timetable.append((route_idx, mav_idx, takeoff_time, landing_time))
+        heapq.heappush(mavs, (landing_time, mav_idx))
+        if battery_charging_time is not None:
+            heapq.heappush(batteries, landing_time + battery_charging_time)
+        makespan = max(makespan, landing_time)
+    return timetable, makespan
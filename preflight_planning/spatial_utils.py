@@ -0,0 +1,249 @@
+import heapq
+import math
+
+import numpy as np
+
+
+class RemainingPointsIndex(object):
+    """KD-tree over the delivery points that supports deletion, for the nearest-neighbour selection of find_routes.
+
+    find_routes picks the remaining point that minimizes the distance from
+    the current point plus the distance from that point back home. The tree
+    answers that with a best-first branch and bound over its bounding boxes,
+    whose lower bound is the distance from the current point to the box plus
+    the distance from home to the box. Points are never moved, a boolean
+    mask tells which ones remain and each node counts its remaining points,
+    so emptied subtrees are skipped.
+
+    Ties are broken like min(zip(distances, coords)) does, first by the
+    coordinate and then by the position in coord_list.
+
+    Parameters
+    ----------
+    coord_list : list of lists
+        (x, y) coordinates of the delivery points.
+    home_coord : list
+        (x, y) coordinate where every route starts and ends.
+    leaf_size : int
+        Maximum number of points in a leaf of the tree.
+
+    Attributes
+    ----------
+    distances_to_home : numpy.ndarray
+        Straight-line distance from each point to home_coord.
+    remaining : numpy.ndarray
+        Boolean mask of the points not removed yet.
+    num_remaining : int
+        Number of points not removed yet.
+
+    """
+
+    def __init__(self, coord_list, home_coord, leaf_size=16):
+        self.coord_list = coord_list
+        points = np.array(coord_list).reshape(len(coord_list), 2)
+        self.distances_to_home = np.linalg.norm(
+            np.array(home_coord) - points,
+            axis=1
+        )
+        self.remaining = np.ones(len(coord_list), dtype=bool)
+        self.num_remaining = len(coord_list)
+        # Python scalars are faster than numpy ones in the query loop, and
+        # ints keep the distances exactly equal to np.linalg.norm.
+        self._points = points.tolist()
+        self._keys = [tuple(coord) for coord in coord_list]
+        self._distances_to_home = self.distances_to_home.tolist()
+
+        # Nodes are stored in flat lists, the root is the node 0.
+        self._order = []
+        self._start = []
+        self._stop = []
+        self._children = []
+        self._boxes = []
+        self._counts = []
+        self._parents = []
+        self._leaf_of = [0] * len(coord_list)
+        if len(coord_list):
+            self._build(np.arange(len(coord_list)), points, leaf_size)
+        # Home never moves, so its half of the lower bounds is precomputed.
+        self._home_coord = home_coord
+        home_x, home_y = [float(x) for x in home_coord]
+        self._home_bounds = [self._box_distance(node, home_x, home_y)
+                             for node in range(len(self._boxes))]
+
+    def _build(self, idxs, points, leaf_size):
+        """Split the points recursively at the median of the widest axis."""
+        stack = [(idxs, -1, None)]
+        while stack:
+            idxs, parent, side = stack.pop()
+            node = len(self._start)
+            if parent != -1:
+                self._children[parent][side] = node
+            coords = points[idxs].astype(np.float64)
+            low, high = coords.min(axis=0), coords.max(axis=0)
+            self._boxes.append(tuple(low.tolist() + high.tolist()))
+            self._counts.append(len(idxs))
+            self._parents.append(parent)
+            if len(idxs) <= leaf_size:
+                self._start.append(len(self._order))
+                self._order.extend(idxs.tolist())
+                self._stop.append(len(self._order))
+                self._children.append(None)
+                for idx in idxs.tolist():
+                    self._leaf_of[idx] = node
+                continue
+            self._start.append(-1)
+            self._stop.append(-1)
+            self._children.append([-1, -1])
+            axis = int(np.argmax(high - low))
+            half = len(idxs) // 2
+            idxs = idxs[np.argpartition(coords[:, axis], half)]
+            stack.append((idxs[half:], node, 1))
+            stack.append((idxs[:half], node, 0))
+
+    def _box_distance(self, node, x, y):
+        """Distance from (x, y) to the bounding box of a node."""
+        low_x, low_y, high_x, high_y = self._boxes[node]
+        dx = low_x - x if x < low_x else (x - high_x if x > high_x else 0.0)
+        dy = low_y - y if y < low_y else (y - high_y if y > high_y else 0.0)
+        return math.sqrt(dx * dx + dy * dy)
+
+    def nearest(self, curr_idx):
+        """Remaining point that minimizes the distance from the current point plus the distance back home.
+
+        Parameters
+        ----------
+        curr_idx : int
+            Position of the current point in coord_list, or -1 for home.
+
+        Returns
+        -------
+        (int, float)
+            Position of the point in coord_list and its distance, or (-1, inf) if no point remains.
+
+        """
+        if self.num_remaining == 0:
+            return -1, float('inf')
+        curr_coord = self._home_coord if curr_idx == -1 \
+            else self.coord_list[curr_idx]
+        x, y = curr_coord[0], curr_coord[1]
+        float_x, float_y = float(x), float(y)
+        best = None
+        best_distance = float('inf')
+        heap = [(0.0, 0)]
+        while heap:
+            lower_bound, node = heapq.heappop(heap)
+            # The slack keeps rounding in the bound from pruning a tie.
+            if lower_bound > best_distance + 1e-9 * (1.0 + best_distance):
+                break
+            children = self._children[node]
+            if children is None:
+                for idx in self._order[self._start[node]:self._stop[node]]:
+                    if not self.remaining[idx]:
+                        continue
+                    point_x, point_y = self._points[idx]
+                    dx, dy = x - point_x, y - point_y
+                    distance = math.sqrt(dx * dx + dy * dy) \
+                        + self._distances_to_home[idx]
+                    key = (distance, self._keys[idx], idx)
+                    if best is None or key < best:
+                        best = key
+                        best_distance = distance
+                continue
+            for child in children:
+                if self._counts[child]:
+                    # Lower bound of the distance from curr_coord to a point
+                    # of the child and from that point back home.
+                    heapq.heappush(heap, (
+                        self._box_distance(child, float_x, float_y)
+                        + self._home_bounds[child],
+                        child
+                    ))
+        return best[2], best[0]
+
+    def remove(self, idx):
+        """Mark a point as no longer remaining.
+
+        Parameters
+        ----------
+        idx : int
+            Position of the point in coord_list.
+
+        """
+        if not self.remaining[idx]:
+            return
+        self.remaining[idx] = False
+        self.num_remaining -= 1
+        node = self._leaf_of[idx]
+        while node != -1:
+            self._counts[node] -= 1
+            node = self._parents[node]
+
+
+class RemainingPointsMatrix(object):
+    """Same as RemainingPointsIndex, but with the distances of a precomputed matrix.
+
+    Each query scans the matrix row of the current point, so it's O(n),
+    but vectorized.
+
+    Parameters
+    ----------
+    coord_list : list of lists
+        (x, y) coordinates of the delivery points.
+    distance_matrix : numpy.ndarray
+        (n + 1, n + 1) matrix. The row and column 0 are home, the row and column k are coord_list[k - 1].
+
+    Attributes
+    ----------
+    distances_to_home : numpy.ndarray
+        Distance from each point to home.
+    remaining : numpy.ndarray
+        Boolean mask of the points not removed yet.
+    num_remaining : int
+        Number of points not removed yet.
+
+    """
+
+    def __init__(self, coord_list, distance_matrix):
+        self.coord_list = coord_list
+        self._distance_matrix = np.asarray(distance_matrix, dtype=np.float64)
+        self.distances_to_home = self._distance_matrix[1:, 0]
+        self.remaining = np.ones(len(coord_list), dtype=bool)
+        self.num_remaining = len(coord_list)
+        self._keys = [tuple(coord) for coord in coord_list]
+
+    def nearest(self, curr_idx):
+        """Remaining point that minimizes the distance from the current point plus the distance back home.
+
+        Parameters
+        ----------
+        curr_idx : int
+            Position of the current point in coord_list, or -1 for home.
+
+        Returns
+        -------
+        (int, float)
+            Position of the point in coord_list and its distance, or (-1, inf) if no point remains.
+
+        """
+        if self.num_remaining == 0:
+            return -1, float('inf')
+        distances = self._distance_matrix[curr_idx + 1, 1:] \
+            + self.distances_to_home
+        distances[~self.remaining] = np.inf
+        closest_dist = distances.min()
+        idx = min(np.flatnonzero(distances == closest_dist).tolist(),
+                  key=lambda k: (self._keys[k], k))
+        return idx, float(closest_dist)
+
+    def remove(self, idx):
+        """Mark a point as no longer remaining.
+
+        Parameters
+        ----------
+        idx : int
+            Position of the point in coord_list.
+
+        """
+        if self.remaining[idx]:
+            self.remaining[idx] = False
+            self.num_remaining -= 1
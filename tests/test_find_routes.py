@@ -0,0 +1,83 @@
+import numpy as np
+from mock_data.data import RandomAerialImageDataGenerator
+from preflight_planning.batch_utils import batch_routes, \
+    find_routes_batch, params_table
+from preflight_planning.graph_utils import Params, find_routes
+from preflight_planning.savings_utils import find_routes_savings
+
+
+def make_params(**kwargs):
+    fields = dict(speed=10, landing_time=5, takeoff_time=5,
+                  maximum_flight_time=10, num_people=2, num_packets=3)
+    fields.update(kwargs)
+    return Params(**fields)
+
+
+def test_person_at_home_is_routed():
+    params = make_params()
+    routes, elapsed_time_list = find_routes([[1, 1], [3, 3]], (7, 7),
+                                            [1, 1], params)
+    assert routes == [[[1, 1], [1, 1], [3, 3], [1, 1]]]
+    # Three legs: home to home, home to [3, 3] and back.
+    assert elapsed_time_list == [
+        3 * (params.takeoff_time + params.landing_time)
+        + 2 * np.hypot(2, 2) / params.speed
+    ]
+
+
+
+def test_greedy_routes_fit_in_the_maximum_flight_time():
+    # Each leg costs a takeoff, distance / speed and a landing, and the
+    # whole route, flight back home included, must fit in 36s.
+    params = make_params(maximum_flight_time=0.6, num_people=3)
+    routes, elapsed_time_list = find_routes([[8, 0], [0, 4], [0, 3]],
+                                            (10, 10), [0, 0], params)
+    # [8, 0] would take the first route to 42.09s, so it gets its own.
+    assert routes == [[[0, 0], [0, 3], [0, 4], [0, 0]],
+                      [[0, 0], [8, 0], [0, 0]]]
+    assert np.allclose(elapsed_time_list, [3 * 10 + (3 + 1 + 4) / 10,
+                                           2 * 10 + (8 + 8) / 10])
+
+def test_person_at_home_is_routed_by_both_solvers_and_the_batch():
+    params = make_params()
+    person_coord_list = [[1, 1], [3, 3]]
+    greedy = find_routes(person_coord_list, (7, 7), [1, 1], params)
+    savings = find_routes(person_coord_list, (7, 7), [1, 1], params,
+                          solver='savings')
+    assert sorted(map(str, greedy[0])) == sorted(map(str, savings[0]))
+
+    coords = np.array([person_coord_list])
+    home_coords = np.array([[1, 1]])
+    result = find_routes_batch(coords, np.ones((1, 2), dtype=bool),
+                               home_coords, params_table([params]))
+    assert result['done'][0]
+    assert batch_routes(result, coords, home_coords, 0) == greedy
+
+
+def test_generated_scenario_with_the_helipad_on_a_person():
+    # The helipad is placed on one of the people with this seed.
+    data = RandomAerialImageDataGenerator().generate(
+        people_quantity=10, rng=np.random.default_rng(14)
+    )
+    assert list(data.helipad_coord) in \
+        [list(coord) for coord in data.person_coord_list]
+    routes, _ = find_routes(data.person_coord_list, data.adj_matrix.shape,
+                            data.helipad_coord,
+                            make_params(maximum_flight_time=10**6,
+                                        num_people=10))
+    visited = [coord for route in routes for coord in route[1:-1]]
+    assert sorted(visited) == sorted(data.person_coord_list)
+
+
+def test_savings_returns_the_greedy_routes_when_they_are_cheaper():
+    params = make_params(maximum_flight_time=1, num_people=5)
+    person_coord_list = [[19, 2], [10, 17], [9, 15], [11, 17], [13, 16]]
+    home_coord = [10, 11]
+    # Savings followed by the local search needs 74.83s on its own here.
+    _, savings_elapsed_time_list, _ = find_routes_savings(
+        person_coord_list, home_coord, params
+    )
+    greedy = find_routes(person_coord_list, (20, 20), home_coord, params)
+    assert sum(greedy[1]) < sum(savings_elapsed_time_list)
+    assert find_routes(person_coord_list, (20, 20), home_coord, params,
+                       solver='savings') == greedy
@@ -0,0 +1,22 @@
+import numpy as np
+from landing_zone_detection.graph_utils import find_landing_zone
+from landing_zone_detection.hierarchy_utils import PathHierarchy
+
+
+def test_paths_are_the_shortest():
+    rng = np.random.default_rng(0)
+    adj_matrix = rng.choice([0, -1, 1], size=(48, 48), p=[0.72, 0.27, 0.01])
+    # Walls with a single gap, so the shortest paths leave the corridors.
+    adj_matrix[8::12] = -1
+    adj_matrix[8::12, 40] = 0
+    height_map = rng.normal(0, 3, size=adj_matrix.shape)
+    hierarchy = PathHierarchy(adj_matrix, height_map, cluster_size=8)
+    for person_coord in np.argwhere(adj_matrix == 0)[::25].tolist():
+        _, distance = find_landing_zone(person_coord, adj_matrix, height_map)
+        for algorithm in ('dijkstra', 'astar'):
+            path, hierarchy_distance = hierarchy.find_landing_zone(
+                person_coord, algorithm=algorithm
+            )
+            assert np.isclose(hierarchy_distance, distance, rtol=1e-5)
+            if distance != -1:
+                assert path[0] == person_coord
@@ -0,0 +1,12 @@
+import numpy as np
+from landing_zone_detection.sparse_utils import find_landing_zones_sparse
+
+
+def test_unreached_people_get_their_own_paths():
+    adj_matrix = np.zeros((3, 3), dtype=np.int8)
+    height_map = np.zeros((3, 3), dtype=np.float32)
+    results = find_landing_zones_sparse([[0, 0], [2, 2]], adj_matrix,
+                                        height_map)
+    assert results == [([], -1), ([], -1)]
+    results[0][0].append([0, 0])
+    assert results[1] == ([], -1)